@@ -0,0 +1,106 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BalanceCache:
+    """LRU cache of wallet balances with TTL expiry and single-flight loading
+
+    Keys are checksum addresses. Concurrent misses for the same address share
+    one in-flight fetch, so a burst of lookups costs a single RPC round-trip.
+    Failed fetches are not cached.
+
+    invalidate() stamps the address with a new value of a cache-wide
+    generation counter. A fetch notes the counter when it starts and its
+    put() is dropped if the address was stamped after that, so a read that
+    raced a transfer can't put the pre-transfer balance back. Only the
+    newest max_entries stamps are kept; fetches older than an evicted one
+    are dropped as well.
+    """
+
+    def __init__(self, fetcher: Callable[[str], Awaitable[Dict[str, Any]]],
+                 ttl: float = 3.0, max_entries: int = 10000):
+        self._fetcher = fetcher
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # address -> (expires_at, balances)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._generation = 0
+        self._invalidated: "OrderedDict[str, int]" = OrderedDict()  # address -> generation
+        self._evicted_generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get(self, address: str) -> Dict[str, Any]:
+        entry = self._entries.get(address)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(address)
+            self.hits += 1
+            return entry[1]
+
+        future = self._inflight.get(address)
+        if future is None:
+            self.misses += 1
+            future = asyncio.ensure_future(self._load(address, self.generation()))
+            self._inflight[address] = future
+        else:
+            self.coalesced += 1
+        # Shield so one cancelled caller doesn't cancel the fetch for the others
+        return await asyncio.shield(future)
+
+    async def _load(self, address: str, generation: int) -> Dict[str, Any]:
+        try:
+            balances = await self._fetcher(address)
+            self.put(address, balances, generation)
+            return balances
+        finally:
+            # invalidate() may already have handed the address to a newer fetch
+            if self._inflight.get(address) is asyncio.current_task():
+                del self._inflight[address]
+
+    def generation(self) -> int:
+        """Counter value to pass to put() for a fetch that is about to start"""
+        return self._generation
+
+    def put(self, address: str, balances: Dict[str, Any], generation: Optional[int] = None):
+        """Cache balances; with `generation` they are dropped if the address was invalidated since"""
+        if generation is not None and (
+            generation < self._evicted_generation or self._invalidated.get(address, 0) > generation
+        ):
+            return
+        self._entries[address] = (time.monotonic() + self.ttl, balances)
+        self._entries.move_to_end(address)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, address: str):
+        self._entries.pop(address, None)
+        self._inflight.pop(address, None)
+        self._generation += 1
+        self._invalidated[address] = self._generation
+        self._invalidated.move_to_end(address)
+        while len(self._invalidated) > self.max_entries:
+            _, evicted = self._invalidated.popitem(last=False)
+            self._evicted_generation = evicted
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "ttl": self.ttl,
+            "max_entries": self.max_entries
+        }
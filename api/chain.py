@@ -0,0 +1,94 @@
+import logging
+from typing import Any, List, Optional
+
+import aiohttp
+from web3 import AsyncWeb3, Web3
+from web3.exceptions import TransactionNotFound
+
+from shared.rpc_pool import AsyncPooledHTTPProvider
+
+logger = logging.getLogger(__name__)
+
+
+class ChainClient:
+    """Single async entry point for all blockchain reads made by the API
+
+    Wraps an AsyncWeb3 instance whose provider reuses one aiohttp session with
+    keep-alive connections, so concurrent requests overlap instead of queueing
+    behind a blocking HTTP call. Requests are routed across all configured RPC
+    endpoints with failover, hedging and circuit breakers.
+    """
+
+    def __init__(self, rpc_urls: List[str], token_address: str, token_abi: List[dict],
+                 request_timeout: float = 10.0, max_connections: int = 100):
+        self.rpc_urls = rpc_urls
+        self.request_timeout = request_timeout
+        self.max_connections = max_connections
+        self.provider = AsyncPooledHTTPProvider(rpc_urls, request_timeout=request_timeout)
+        self.w3 = AsyncWeb3(self.provider)
+        self.token = self.w3.eth.contract(
+            address=Web3.to_checksum_address(token_address),
+            abi=token_abi
+        )
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def connect(self):
+        """Open the shared keep-alive session (call once from app startup)"""
+        if self._session is not None:
+            return
+        connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+        self._session = aiohttp.ClientSession(connector=connector)
+        self.provider.use_session(self._session)
+        logger.info(f"✅ Chain client session opened for {len(self.rpc_urls)} RPC endpoints")
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def endpoint_stats(self) -> List[dict]:
+        """Per-endpoint latency, error counts and circuit state"""
+        return self.provider.stats()
+
+    async def is_connected(self) -> bool:
+        try:
+            return await self.w3.is_connected()
+        except Exception:
+            return False
+
+    async def chain_id(self) -> int:
+        return await self.w3.eth.chain_id
+
+    async def block_number(self) -> int:
+        return await self.w3.eth.block_number
+
+    async def block_hash(self, block_number: int) -> Any:
+        return (await self.w3.eth.get_block(block_number))["hash"]
+
+    async def get_logs(self, filter_params: dict) -> List[Any]:
+        return await self.w3.eth.get_logs(filter_params)
+
+    async def transaction_receipt(self, tx_hash: str) -> Optional[Any]:
+        """Receipt of a mined transaction, None while it is unknown or pending"""
+        try:
+            return await self.w3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            return None
+
+    async def transaction(self, tx_hash: str) -> Optional[Any]:
+        try:
+            return await self.w3.eth.get_transaction(tx_hash)
+        except TransactionNotFound:
+            return None
+
+    async def native_balance(self, address: str) -> int:
+        """Native (BNB) balance in wei"""
+        return await self.w3.eth.get_balance(address)
+
+    async def token_balance(self, address: str) -> int:
+        """Token balance in base units"""
+        return await self.token.functions.balanceOf(address).call()
+
+    async def token_call(self, fn_name: str, *args) -> Any:
+        """Call a read-only token function such as decimals() or totalSupply()"""
+        return await self.token.functions[fn_name](*args).call()
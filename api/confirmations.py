@@ -0,0 +1,269 @@
+import json
+import asyncio
+import logging
+from decimal import Decimal
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+import queries
+from chain import ChainClient
+from database import ConnectionPool
+from indexer import TRANSFER_TOPIC, _hex, decode_transfer
+
+logger = logging.getLogger(__name__)
+
+
+def transfer_event(row, status: str, block_number: Optional[int] = None) -> Dict[str, Any]:
+    """Status change message for a transfers row (id, from, to, token, amount, tx_hash, ...)"""
+    return {
+        "id": row[0],
+        "from": row[1],
+        "to": row[2],
+        "token": row[3],
+        "amount": row[4],
+        "tx_hash": row[5],
+        "status": status,
+        "block_number": block_number
+    }
+
+
+def _same_address(a: Any, b: Any) -> bool:
+    return a is not None and b is not None and str(a).lower() == str(b).lower()
+
+
+def to_base_units(amount: float, decimals: int) -> Optional[int]:
+    """Exact integer amount, or None if `amount` has more precision than `decimals`"""
+    units = Decimal(str(amount)).scaleb(decimals)
+    if not units.is_finite() or units != units.to_integral_value():
+        return None
+    return int(units)
+
+
+def receipt_matches(row, receipt, transaction, token_address: str, decimals: int) -> bool:
+    """Whether a successful receipt is really the transfer the row claims
+
+    BNB transfers must be a plain value transfer from -> to of exactly the
+    amount; SELA transfers a call to the token contract that emitted a
+    Transfer(from, to, amount) log.
+    """
+    _, from_address, to_address, token, amount = row[:5]
+    if not _same_address(receipt["from"], from_address):
+        return False
+
+    if token == "BNB":
+        return (
+            transaction is not None
+            and _same_address(receipt["to"], to_address)
+            and transaction["value"] == to_base_units(amount, 18)
+        )
+
+    if not _same_address(receipt["to"], token_address):
+        return False
+    expected = to_base_units(amount, decimals)
+    for log in receipt["logs"]:
+        if (not _same_address(log["address"], token_address) or len(log["topics"]) != 3
+                or _hex(log["topics"][0]) != TRANSFER_TOPIC):
+            continue
+        _, _, _, log_from, log_to, value = decode_transfer(log)
+        if _same_address(log_from, from_address) and _same_address(log_to, to_address) and value == expected:
+            return True
+    return False
+
+
+class TransferEvents:
+    """Fans transfer status changes out to subscribers per wallet
+
+    Each subscriber gets a bounded queue; a subscriber that stops reading
+    loses its oldest events instead of holding memory or blocking publishers.
+    """
+
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    def subscribe(self, wallet_address: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.max_queue)
+        self._subscribers.setdefault(wallet_address.lower(), set()).add(queue)
+        return queue
+
+    def unsubscribe(self, wallet_address: str, queue: asyncio.Queue):
+        key = wallet_address.lower()
+        subscribers = self._subscribers.get(key)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[key]
+
+    def publish(self, event: Dict[str, Any]):
+        wallets = {str(event["from"]).lower(), str(event["to"]).lower()}
+        for wallet in wallets:
+            for queue in self._subscribers.get(wallet, ()):
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(event)
+
+    async def stream(self, wallet_address: str, keepalive: float = 15.0) -> AsyncIterator[str]:
+        """Server-sent events for one wallet, with comment lines as keep-alives"""
+        queue = self.subscribe(wallet_address)
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: transfer\ndata: {json.dumps(event)}\n\n"
+        finally:
+            self.unsubscribe(wallet_address, queue)
+
+
+class ConfirmationTracker:
+    """Follows pending on-chain transfers to a final status in the background
+
+    On every new block the pending rows that need a look - no receipt seen
+    yet, or deep enough to finalize - have their receipts fetched in
+    concurrent batches. A transfer becomes "completed" once its block is
+    `confirmations` deep and the receipt matches the row (see
+    receipt_matches); a reverted or mismatching transaction makes it
+    "failed". The receipt is read again at that point so a reorged-out
+    transaction goes back to waiting. Transfers with no receipt after
+    `pending_timeout` seconds are "dropped".
+    All changes of one pass are written with a single executemany.
+    """
+
+    def __init__(self, chain: ChainClient, db: ConnectionPool, events: TransferEvents,
+                 token_address: str, token_decimals: Callable[[], Awaitable[int]],
+                 confirmations: int = 12, poll_interval: float = 3.0, batch_size: int = 50,
+                 pending_timeout: float = 3600.0,
+                 on_settled: Optional[Callable[[List[Dict[str, Any]]], None]] = None):
+        self.chain = chain
+        self.db = db
+        self.events = events
+        self.token_address = token_address
+        self.token_decimals = token_decimals
+        self.confirmations = max(confirmations, 1)
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.pending_timeout = pending_timeout
+        self.on_settled = on_settled
+        self._head: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _batched(self, lookup: Callable[[str], Awaitable[Any]], tx_hashes: List[str]) -> List[Any]:
+        results = []
+        for start in range(0, len(tx_hashes), self.batch_size):
+            chunk = tx_hashes[start:start + self.batch_size]
+            results.extend(await asyncio.gather(
+                *(lookup(tx_hash) for tx_hash in chunk),
+                return_exceptions=True
+            ))
+        return results
+
+    async def _verify(self, rows: List[tuple], receipts: List[Any]) -> List[Any]:
+        """receipt_matches() per row (or the lookup exception) for successful receipts"""
+        bnb_hashes = [row[5] for row in rows if row[3] == "BNB"]
+        transactions = dict(zip(bnb_hashes, await self._batched(self.chain.transaction, bnb_hashes)))
+        decimals = await self.token_decimals() if len(bnb_hashes) < len(rows) else None
+
+        results = []
+        for row, receipt in zip(rows, receipts):
+            transaction = transactions.get(row[5])
+            if isinstance(transaction, Exception):
+                results.append(transaction)
+                continue
+            results.append(receipt_matches(row, receipt, transaction, self.token_address, decimals))
+        return results
+
+    async def check(self, head: int) -> int:
+        """One pass over pending transfers at chain head `head`; returns rows updated"""
+        pending = await self.db.fetchall(queries.PENDING_TRANSFERS)
+        # Rows: id, from, to, token, amount, tx_hash, block_number, age in seconds
+        due = [
+            row for row in pending
+            if row[6] is None or row[6] + self.confirmations - 1 <= head
+        ]
+        if not due:
+            return 0
+
+        receipts = await self._batched(self.chain.transaction_receipt, [row[5] for row in due])
+
+        # Successful receipts deep enough to finalize are checked against their row
+        final = [
+            (row, receipt) for row, receipt in zip(due, receipts)
+            if receipt is not None and not isinstance(receipt, Exception) and receipt["status"] == 1
+            and head - receipt["blockNumber"] + 1 >= self.confirmations
+        ]
+        matches = dict(zip(
+            [row[0] for row, _ in final],
+            await self._verify([row for row, _ in final], [receipt for _, receipt in final]) if final else []
+        ))
+
+        updates = []
+        settled = []
+        for row, receipt in zip(due, receipts):
+            if isinstance(receipt, Exception):
+                logger.warning(f"Receipt lookup failed for {row[5]}: {receipt}")
+                continue
+
+            if receipt is None:
+                if row[6] is not None:
+                    # Seen in a block that was reorged away - wait for it again
+                    updates.append(("pending", None, row[0]))
+                    self.events.publish(transfer_event(row, "pending"))
+                elif row[7] > self.pending_timeout:
+                    updates.append(("dropped", None, row[0]))
+                    settled.append(transfer_event(row, "dropped"))
+                continue
+
+            block_number = receipt["blockNumber"]
+            if head - block_number + 1 >= self.confirmations:
+                if receipt["status"] != 1:
+                    status = "failed"
+                elif isinstance(matches[row[0]], Exception):
+                    logger.warning(f"Transaction lookup failed for {row[5]}: {matches[row[0]]}")
+                    continue
+                elif matches[row[0]]:
+                    status = "completed"
+                else:
+                    logger.warning(f"⚠️ Transfer {row[0]} does not match transaction {row[5]}")
+                    status = "failed"
+                updates.append((status, block_number, row[0]))
+                settled.append(transfer_event(row, status, block_number))
+            elif block_number != row[6]:
+                updates.append(("pending", block_number, row[0]))
+                self.events.publish(transfer_event(row, "pending", block_number))
+
+        if updates:
+            await self.db.executemany(queries.UPDATE_TRANSFER_STATUS, updates)
+
+        for event in settled:
+            self.events.publish(event)
+        if settled:
+            logger.info(f"✅ {len(settled)} transfers settled at block {head}")
+            if self.on_settled is not None:
+                self.on_settled(settled)
+
+        return len(updates)
+
+    async def _run(self):
+        while True:
+            try:
+                head = await self.chain.block_number()
+                if head != self._head:
+                    await self.check(head)
+                    self._head = head
+            except Exception as e:
+                logger.error(f"Confirmation tracker error: {str(e)}")
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,160 @@
+import os
+import queue
+import sqlite3
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+def _database_path() -> str:
+    """Resolve the SQLite file from DATABASE_URL (sqlite:///path) or DATABASE_PATH"""
+    url = os.getenv("DATABASE_URL", "")
+    if url.startswith("sqlite:///"):
+        return url[len("sqlite:///"):]
+    return os.getenv("DATABASE_PATH", "data/sela.db")
+
+
+DATABASE_PATH = _database_path()
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "30"))
+# Per-connection cache of compiled statements, keyed by SQL text
+DB_STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", "256"))
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections in WAL mode, served off the event loop"""
+
+    def __init__(self, path: str = DATABASE_PATH, size: int = DB_POOL_SIZE,
+                 timeout: float = DB_BUSY_TIMEOUT):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._created = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="sqlite")
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=DB_STATEMENT_CACHE
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+
+        return self._idle.get(timeout=self.timeout)
+
+    def _release(self, conn: sqlite3.Connection):
+        self._idle.put_nowait(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; the open transaction is rolled back on error"""
+        conn = self._acquire()
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+
+    def run_sync(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run fn(conn) inside a transaction that commits on success"""
+        with self.connection() as conn:
+            result = fn(conn)
+            conn.commit()
+            return result
+
+    async def run(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run fn(conn) in a transaction on the pool's worker threads"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.run_sync, fn)
+
+    async def fetchone(self, sql: str, params: Sequence = ()) -> Optional[tuple]:
+        return await self.run(lambda conn: conn.execute(sql, params).fetchone())
+
+    async def fetchall(self, sql: str, params: Sequence = ()) -> List[tuple]:
+        return await self.run(lambda conn: conn.execute(sql, params).fetchall())
+
+    async def execute(self, sql: str, params: Sequence = ()) -> int:
+        """Execute a write statement and return the affected row count"""
+        return await self.run(lambda conn: conn.execute(sql, params).rowcount)
+
+    async def executemany(self, sql: str, rows: Iterable[Sequence]) -> int:
+        return await self.run(lambda conn: conn.executemany(sql, rows).rowcount)
+
+    def _connect_readonly(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            f"file:{self.path}?mode=ro",
+            uri=True,
+            timeout=self.timeout,
+            check_same_thread=False
+        )
+        conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        return conn
+
+    async def stream(self, sql: str, params: Sequence = (), batch_size: int = 500) -> AsyncIterator[tuple]:
+        """Yield the rows of a query straight from its cursor, batch_size at a time
+
+        Each stream reads over its own read-only connection, held until the
+        iteration ends or is closed, so the whole result never has to sit in
+        memory and a slow client never keeps a pooled connection from the
+        request handlers.
+        """
+        loop = asyncio.get_running_loop()
+        conn = await loop.run_in_executor(self._executor, self._connect_readonly)
+        try:
+            cursor = await loop.run_in_executor(self._executor, conn.execute, sql, params)
+            try:
+                while True:
+                    rows = await loop.run_in_executor(self._executor, cursor.fetchmany, batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield row
+            finally:
+                cursor.close()
+        finally:
+            conn.close()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._created = 0
+
+
+db = ConnectionPool()
@@ -0,0 +1,106 @@
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from chain import ChainClient
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    """Samples chain status in the background so /healthz answers from memory"""
+
+    def __init__(self, chain: ChainClient, interval: float = 15.0):
+        self.chain = chain
+        self.interval = interval
+        self._chain_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._snapshot: Dict[str, Any] = {
+            "status": "starting",
+            "bsc_connected": False,
+            "token_connected": False,
+            "chain_id": None,
+            "block_number": None,
+            "network": "BSC (Binance Smart Chain)",
+            "checked_at": None
+        }
+        self._checked_monotonic: Optional[float] = None
+
+    async def probe(self, deep: bool = False) -> Dict[str, Any]:
+        """Check the chain now; deep also re-reads chain id and connectivity"""
+        if deep:
+            bsc_connected = await self.chain.is_connected()
+            chain_id = await self.chain.chain_id() if bsc_connected else None
+            block_number = await self.chain.block_number() if bsc_connected else None
+        else:
+            # A block number answer already proves connectivity; chain id never changes
+            try:
+                block_number = await self.chain.block_number()
+                bsc_connected = True
+            except Exception as e:
+                logger.warning(f"Block number probe failed: {e}")
+                block_number = None
+                bsc_connected = False
+            if bsc_connected and self._chain_id is None:
+                self._chain_id = await self.chain.chain_id()
+            chain_id = self._chain_id if bsc_connected else None
+
+        # Test token connection
+        token_connected = False
+        if bsc_connected:
+            try:
+                # Try to get total supply to test connection
+                await self.chain.token_call("totalSupply")
+                token_connected = True
+            except Exception as e:
+                logger.warning(f"Token connection test failed: {e}")
+
+        return {
+            "status": "healthy" if bsc_connected else "degraded",
+            "bsc_connected": bsc_connected,
+            "token_connected": token_connected,
+            "chain_id": chain_id,
+            "block_number": block_number,
+            "network": "BSC (Binance Smart Chain)",
+            "checked_at": datetime.now().isoformat()
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                self._snapshot = await self.probe()
+            except Exception as e:
+                logger.error(f"Health probe error: {str(e)}")
+                self._snapshot = dict(
+                    self._snapshot,
+                    status="unhealthy",
+                    error=str(e),
+                    checked_at=datetime.now().isoformat()
+                )
+            self._checked_monotonic = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def current(self) -> Dict[str, Any]:
+        """Last sampled status; marked stale if the sampler has fallen behind"""
+        snapshot = dict(self._snapshot)
+        if self._checked_monotonic is not None:
+            age = time.monotonic() - self._checked_monotonic
+            snapshot["age_seconds"] = round(age, 3)
+            if age > 3 * self.interval:
+                snapshot["status"] = "stale"
+        return snapshot
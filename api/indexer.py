@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import sqlite3
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from web3 import Web3
+
+import queries
+from chain import ChainClient
+from database import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# keccak("Transfer(address,address,uint256)")
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+# Addresses per SELECT ... IN (...) when reading balances to update
+BALANCE_READ_CHUNK = 500
+
+
+def _hex(value: Any) -> str:
+    return value if isinstance(value, str) else "0x" + bytes(value).hex()
+
+
+def decode_transfer(log: Dict[str, Any]) -> Tuple[int, int, str, str, str, int]:
+    """(block_number, log_index, tx_hash, from, to, value) of a Transfer log"""
+    topics = [_hex(topic) for topic in log["topics"]]
+    data = _hex(log["data"])
+    return (
+        log["blockNumber"],
+        log["logIndex"],
+        _hex(log["transactionHash"]),
+        Web3.to_checksum_address("0x" + topics[1][-40:]),
+        Web3.to_checksum_address("0x" + topics[2][-40:]),
+        int(data, 16) if data not in ("0x", "") else 0
+    )
+
+
+def _add_balances(conn: sqlite3.Connection, deltas: Dict[str, int]):
+    """Apply raw balance changes; balances are uint256 so they are stored as text"""
+    addresses = [address for address, delta in deltas.items() if delta and address != ZERO_ADDRESS]
+    current: Dict[str, int] = {}
+    for start in range(0, len(addresses), BALANCE_READ_CHUNK):
+        chunk = addresses[start:start + BALANCE_READ_CHUNK]
+        placeholders = ",".join("?" * len(chunk))
+        for address, balance in conn.execute(
+            f"SELECT address, balance FROM token_balances WHERE address IN ({placeholders})", chunk
+        ):
+            current[address] = int(balance)
+    conn.executemany(
+        "INSERT OR REPLACE INTO token_balances (address, balance) VALUES (?, ?)",
+        [(address, str(current.get(address, 0) + deltas[address])) for address in addresses]
+    )
+
+
+class TransferIndexer:
+    """Indexes the token's Transfer logs into local history and balance tables
+
+    Logs are read with eth_getLogs over block ranges that adapt to the node:
+    a failing or oversized range is halved, a quiet one doubled up to
+    `max_range`. Each range is applied in one transaction together with its
+    checkpoint, so a restart resumes from the last committed block.
+
+    The hashes of the checkpoint and of every block with logs are kept for
+    the last `reorg_window` blocks. Before each range the checkpoint hash is
+    compared with the chain; on a mismatch the newest stored block that is
+    still canonical is found by binary search and everything after it is
+    rolled back, balances included; a reorg deeper than the window
+    re-indexes from `start_block`. `lag` keeps the indexer a few blocks
+    behind the head so most reorgs never reach it.
+    """
+
+    def __init__(self, chain: ChainClient, db: ConnectionPool, token_address: str, start_block: int,
+                 lag: int = 3, initial_range: int = 2000, min_range: int = 1, max_range: int = 5000,
+                 target_logs: int = 5000, reorg_window: int = 1000, poll_interval: float = 3.0):
+        self.chain = chain
+        self.db = db
+        self.token_address = Web3.to_checksum_address(token_address)
+        self.start_block = start_block
+        self.lag = lag
+        self.range = initial_range
+        self.min_range = min_range
+        self.max_range = max_range
+        self.target_logs = target_logs
+        self.reorg_window = reorg_window
+        self.poll_interval = poll_interval
+        self.head: Optional[int] = None
+        self.reorgs = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def checkpoint(self) -> Optional[Tuple[int, str]]:
+        """(block_number, block_hash) of the last indexed block"""
+        return await self.db.fetchone(queries.INDEXER_CHECKPOINT)
+
+    def _apply(self, conn: sqlite3.Connection, logs: List[Dict[str, Any]], to_block: int, to_hash: str):
+        transfers = [decode_transfer(log) for log in logs]
+        conn.executemany(
+            "INSERT INTO token_transfers "
+            "(block_number, log_index, tx_hash, from_address, to_address, value) VALUES (?, ?, ?, ?, ?, ?)",
+            [row[:5] + (str(row[5]),) for row in transfers]
+        )
+
+        deltas: Dict[str, int] = defaultdict(int)
+        for _, _, _, from_address, to_address, value in transfers:
+            deltas[from_address] -= value
+            deltas[to_address] += value
+        _add_balances(conn, deltas)
+
+        hashes = {log["blockNumber"]: _hex(log["blockHash"]) for log in logs}
+        hashes[to_block] = to_hash
+        conn.executemany(
+            "INSERT OR REPLACE INTO indexed_blocks (block_number, block_hash) VALUES (?, ?)",
+            sorted(hashes.items())
+        )
+        conn.execute("DELETE FROM indexed_blocks WHERE block_number < ?", (to_block - self.reorg_window,))
+
+    def _rollback(self, conn: sqlite3.Connection, fork_block: int):
+        """Undo everything indexed after fork_block (the last block still canonical)"""
+        deltas: Dict[str, int] = defaultdict(int)
+        for from_address, to_address, value in conn.execute(
+            "SELECT from_address, to_address, value FROM token_transfers WHERE block_number > ?", (fork_block,)
+        ):
+            deltas[from_address] += int(value)
+            deltas[to_address] -= int(value)
+        _add_balances(conn, deltas)
+        conn.execute("DELETE FROM token_transfers WHERE block_number > ?", (fork_block,))
+        conn.execute("DELETE FROM indexed_blocks WHERE block_number > ?", (fork_block,))
+
+    async def _block_hash(self, block_number: int) -> str:
+        return _hex(await self.chain.block_hash(block_number))
+
+    async def _find_fork(self) -> int:
+        """Newest stored block whose hash still matches the chain"""
+        stored = await self.db.fetchall("SELECT block_number, block_hash FROM indexed_blocks ORDER BY block_number")
+        low, high = 0, len(stored) - 1
+        fork = None
+        while low <= high:
+            middle = (low + high) // 2
+            block_number, block_hash = stored[middle]
+            if await self._block_hash(block_number) == block_hash:
+                fork = block_number
+                low = middle + 1
+            else:
+                high = middle - 1
+        if fork is None:
+            # Deeper than the window - nothing stored proves an older block
+            # canonical, so transfers and balances go back to the start too
+            fork = self.start_block - 1
+            logger.error(f"❌ Reorg deeper than {self.reorg_window} blocks, re-indexing from {self.start_block}")
+        return fork
+
+    async def _handle_reorg(self):
+        fork = await self._find_fork()
+        await self.db.run(lambda conn: self._rollback(conn, fork))
+        self.reorgs += 1
+        logger.warning(f"⚠️ Chain reorg - index rolled back to block {fork}")
+
+    async def step(self) -> bool:
+        """Index the next block range; returns True once caught up with the head"""
+        self.head = await self.chain.block_number() - self.lag
+        checkpoint = await self.checkpoint()
+
+        if checkpoint is not None:
+            if await self._block_hash(checkpoint[0]) != checkpoint[1]:
+                await self._handle_reorg()
+                return False
+            from_block = checkpoint[0] + 1
+        else:
+            from_block = self.start_block
+
+        if from_block > self.head:
+            return True
+        to_block = min(from_block + self.range - 1, self.head)
+
+        # Hash read before and after the logs, so logs can't straddle a reorg unnoticed
+        to_hash = await self._block_hash(to_block)
+        try:
+            logs = await self.chain.get_logs({
+                "address": self.token_address,
+                "topics": [TRANSFER_TOPIC],
+                "fromBlock": from_block,
+                "toBlock": to_block
+            })
+        except Exception as e:
+            if self.range <= self.min_range:
+                raise
+            self.range = max(self.range // 2, self.min_range)
+            logger.warning(f"getLogs {from_block}-{to_block} failed ({e}), range now {self.range}")
+            return False
+        if await self._block_hash(to_block) != to_hash:
+            return False
+
+        await self.db.run(lambda conn: self._apply(conn, logs, to_block, to_hash))
+
+        if len(logs) > self.target_logs:
+            self.range = max(self.range // 2, self.min_range)
+        elif len(logs) < self.target_logs // 4:
+            self.range = min(self.range * 2, self.max_range)
+
+        return to_block >= self.head
+
+    async def _run(self):
+        while True:
+            try:
+                caught_up = await self.step()
+            except Exception as e:
+                logger.error(f"Indexer error: {str(e)}")
+                caught_up = True
+            if caught_up:
+                await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def status(self) -> Dict[str, Any]:
+        checkpoint = await self.checkpoint()
+        indexed_block = checkpoint[0] if checkpoint else None
+        return {
+            "token_address": self.token_address,
+            "start_block": self.start_block,
+            "indexed_block": indexed_block,
+            "head_block": self.head,
+            "blocks_behind": self.head - indexed_block if self.head is not None and indexed_block is not None else None,
+            "range": self.range,
+            "reorgs": self.reorgs,
+            "running": self._task is not None
+        }
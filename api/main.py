@@ -1,20 +1,53 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from web3 import Web3
 import os
 import json
+import math
+import asyncio
 import aiofiles
-import sqlite3
 from typing import Dict, Any
 import logging
+import sqlite3
 from datetime import datetime
 
+import queries
+from balance_cache import BalanceCache
+from chain import ChainClient
+from confirmations import ConfirmationTracker, TransferEvents, transfer_event
+from database import db
+from health import HealthMonitor
+from indexer import TransferIndexer
+from migrations import QueryPlanError, migrate, assert_query_plans, check_query_plans
+from multicall import BatchBalanceFetcher
+from orderbook_depth import OrderBookDepth
+from pagination import decode_cursor, encode_cursor, ndjson_lines
+from shared.rpc_pool import rpc_urls_from_env
+from shared.token_metadata import token_metadata
+from transfer_batch import (
+    is_tx_hash, new_transfer_id, new_tx_hash, parse_transfer, plan_batch, senders_of, transfer_status,
+    tx_hashes_of
+)
+
 # Configuration - USING BSC ONLY
-BSC_RPC_URL = "https://bsc-dataseed.binance.org/"
+# BSC_RPC_URLS is a comma separated endpoint list; BSC_RPC_URL still works for one
+BSC_RPC_URLS = rpc_urls_from_env()
+BSC_RPC_URL = BSC_RPC_URLS[0]
 SELA_TOKEN_ADDRESS = "0xACb0A09414CEA1C879c67bB7A877E4e19480f022"
+BSC_CHAIN_ID = 56
 
-# Initialize Web3 with BSC
-w3 = Web3(Web3.HTTPProvider(BSC_RPC_URL))
+# Shown by display endpoints until the token metadata can be read from the
+# chain; never used to compute amounts
+SELA_DEFAULT_METADATA = {
+    "decimals": 15,  # Your token has 15 decimals
+    "symbol": "SLH",
+    "name": "SLH Token"
+}
+
+# RPC request timeout and keep-alive connection pool size
+RPC_TIMEOUT = float(os.getenv("RPC_TIMEOUT", "10"))
+RPC_MAX_CONNECTIONS = int(os.getenv("RPC_MAX_CONNECTIONS", "100"))
 
 app = FastAPI(title="SELA BSC API", version="4.0.0")
 
@@ -69,56 +102,90 @@ SELA_ABI = [
     }
 ]
 
-# Real balances cache - will be populated from blockchain
-REAL_BALANCES = {}
+# Async chain client with BSC - shared keep-alive session, opened on startup
+chain = ChainClient(
+    BSC_RPC_URLS,
+    SELA_TOKEN_ADDRESS,
+    SELA_ABI,
+    request_timeout=RPC_TIMEOUT,
+    max_connections=RPC_MAX_CONNECTIONS
+)
+
+# Background chain health sampling - /healthz answers from the last sample
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "15"))
+HEALTH_MONITOR = HealthMonitor(chain, interval=HEALTH_CHECK_INTERVAL)
+
+# Balance cache settings - BSC produces a block roughly every 3 seconds
+BALANCE_CACHE_TTL = float(os.getenv("BALANCE_CACHE_TTL", "3"))
+BALANCE_CACHE_SIZE = int(os.getenv("BALANCE_CACHE_SIZE", "10000"))
+
+# Bulk balance lookups - wallets per Multicall eth_call and concurrent calls
+MULTICALL_CHUNK_SIZE = int(os.getenv("MULTICALL_CHUNK_SIZE", "250"))
+MULTICALL_MAX_PARALLEL = int(os.getenv("MULTICALL_MAX_PARALLEL", "4"))
+MAX_BATCH_WALLETS = int(os.getenv("MAX_BATCH_WALLETS", "5000"))
+
+# Batch transfers - items per request (a batch is written in one transaction)
+MAX_BATCH_TRANSFERS = int(os.getenv("MAX_BATCH_TRANSFERS", "10000"))
+
+# Transfers with a real tx_hash stay "pending" until their block is this deep
+TRANSFER_CONFIRMATIONS = int(os.getenv("TRANSFER_CONFIRMATIONS", "12"))
+CONFIRMATION_POLL_INTERVAL = float(os.getenv("CONFIRMATION_POLL_INTERVAL", "3"))
+# Concurrent receipt lookups per batch, and seconds before an unseen tx counts as dropped
+RECEIPT_BATCH_SIZE = int(os.getenv("RECEIPT_BATCH_SIZE", "50"))
+TRANSFER_PENDING_TIMEOUT = float(os.getenv("TRANSFER_PENDING_TIMEOUT", "3600"))
+
+# Transfer status subscribers (/transfers/{wallet_address}/events)
+TRANSFER_EVENTS = TransferEvents()
+SSE_KEEPALIVE = float(os.getenv("SSE_KEEPALIVE", "15"))
+
+# SELA Transfer log indexer - set INDEXER_START_BLOCK to the token's deployment
+# block to enable it (balances are summed from every Transfer since then)
+INDEXER_START_BLOCK = os.getenv("INDEXER_START_BLOCK")
+INDEXER_LAG = int(os.getenv("INDEXER_LAG", "3"))
+INDEXER_MAX_RANGE = int(os.getenv("INDEXER_MAX_RANGE", "5000"))
+INDEXER_POLL_INTERVAL = float(os.getenv("INDEXER_POLL_INTERVAL", "3"))
+
+TRANSFER_INDEXER = TransferIndexer(
+    chain,
+    db,
+    SELA_TOKEN_ADDRESS,
+    int(INDEXER_START_BLOCK),
+    lag=INDEXER_LAG,
+    initial_range=min(2000, INDEXER_MAX_RANGE),
+    max_range=INDEXER_MAX_RANGE,
+    poll_interval=INDEXER_POLL_INTERVAL
+) if INDEXER_START_BLOCK else None
+
+# Aggregated order book depth - kept in step with the orders table
+ORDERBOOK_DEPTH = OrderBookDepth()
+
+# Upper bound for the /orderbook depth parameter
+MAX_ORDERBOOK_DEPTH = 500
+
+# Refuse to start when a hot query stops using its indexes (for dev and CI runs)
+STRICT_QUERY_PLANS = os.getenv("STRICT_QUERY_PLANS", "false").lower() == "true"
+
+# Page size bounds for order and transfer history (?format=ndjson exports everything)
+DEFAULT_ORDERS_PAGE_SIZE = 100
+MAX_HISTORY_PAGE_SIZE = 500
 
 # Initialize database
+def _prepare_database(conn):
+    migrate(conn)
+    
+    if STRICT_QUERY_PLANS:
+        assert_query_plans(conn)
+    for problem in check_query_plans(conn):
+        logger.warning(f"⚠️ Query plan regression: {problem}")
+    
+    ORDERBOOK_DEPTH.load(conn.cursor())
+
 def init_db():
     try:
-        conn = sqlite3.connect('data/sela.db')
-        cursor = conn.cursor()
-        
-        # Users table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                user_id TEXT PRIMARY KEY,
-                wallet_address TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Orders table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS orders (
-                id TEXT PRIMARY KEY,
-                user_id TEXT,
-                pair TEXT,
-                side TEXT,
-                price REAL,
-                amount REAL,
-                filled REAL DEFAULT 0,
-                status TEXT DEFAULT 'open',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Transfers table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transfers (
-                id TEXT PRIMARY KEY,
-                from_address TEXT,
-                to_address TEXT,
-                token TEXT,
-                amount REAL,
-                tx_hash TEXT,
-                status TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        db.run_sync(_prepare_database)
         logger.info("✅ Database initialized successfully")
+    except QueryPlanError:
+        raise
     except Exception as e:
         logger.error(f"❌ Database initialization error: {e}")
 
@@ -139,69 +206,84 @@ async def root():
 
 @app.get("/healthz")
 async def health_check():
+    """Cached chain status from the background health monitor"""
+    status = HEALTH_MONITOR.current()
+    status["timestamp"] = datetime.now().isoformat()
+    return status
+
+@app.get("/healthz/deep")
+async def deep_health_check():
+    """Live chain probe - makes several RPC calls, don't use for liveness checks"""
     try:
-        bsc_connected = w3.is_connected()
-        chain_id = w3.eth.chain_id if bsc_connected else None
-        block_number = w3.eth.block_number if bsc_connected else None
-        
-        # Test token connection
-        token_connected = False
-        try:
-            contract = w3.eth.contract(
-                address=w3.to_checksum_address(SELA_TOKEN_ADDRESS),
-                abi=SELA_ABI
-            )
-            # Try to get total supply to test connection
-            contract.functions.totalSupply().call()
-            token_connected = True
-        except Exception as e:
-            logger.warning(f"Token connection test failed: {e}")
-        
-        return {
-            "status": "healthy" if bsc_connected else "degraded",
-            "bsc_connected": bsc_connected,
-            "token_connected": token_connected,
-            "chain_id": chain_id,
-            "block_number": block_number,
-            "network": "BSC (Binance Smart Chain)",
-            "timestamp": datetime.now().isoformat()
-        }
+        status = await HEALTH_MONITOR.probe(deep=True)
+        status["rpc_endpoints"] = chain.endpoint_stats()
+        status["timestamp"] = datetime.now().isoformat()
+        return status
     except Exception as e:
         logger.error(f"Health check error: {str(e)}")
         return {"status": "unhealthy", "error": str(e)}
 
-def get_real_balances_from_blockchain(wallet_address):
-    """Get REAL balances from blockchain - FIXED VERSION"""
+_connected_chain_id = None
+
+async def connected_chain_id():
+    """Chain ID reported by the RPC node, read once"""
+    global _connected_chain_id
+    if _connected_chain_id is None:
+        _connected_chain_id = await chain.chain_id()
+        if _connected_chain_id != BSC_CHAIN_ID:
+            logger.warning(f"⚠️ RPC reports chain ID {_connected_chain_id}, expected {BSC_CHAIN_ID}")
+    return _connected_chain_id
+
+async def get_sela_metadata(required=False):
+    """SELA decimals/symbol/name - read from the chain once, then from the registry
+
+    Without required=True a failed lookup returns SELA_DEFAULT_METADATA for
+    display; the defaults are never stored in the registry.
+    """
     try:
-        checksum_address = w3.to_checksum_address(wallet_address)
-        
-        # Get BNB balance
-        bnb_balance_wei = w3.eth.get_balance(checksum_address)
-        bnb_balance = w3.from_wei(bnb_balance_wei, 'ether')
-        
-        # Get SELA balance
-        contract = w3.eth.contract(
-            address=w3.to_checksum_address(SELA_TOKEN_ADDRESS),
-            abi=SELA_ABI
-        )
-        
-        sela_balance_raw = contract.functions.balanceOf(checksum_address).call()
-        
-        # Get decimals - use 15 as per your token
-        try:
-            decimals = contract.functions.decimals().call()
-        except:
-            decimals = 15  # Your token has 15 decimals
-        
-        sela_balance = sela_balance_raw / (10 ** decimals)
-        
-        logger.info(f"✅ Blockchain balances for {wallet_address}: BNB={float(bnb_balance):.6f}, SELA={float(sela_balance):.6f}")
-        
-        return {
-            "bnb": float(bnb_balance),
-            "sela": float(sela_balance),
-            "registered": True
-        }
+        chain_id = await connected_chain_id()
+    except Exception:
+        if required:
+            raise
+        return dict(SELA_DEFAULT_METADATA)
+    return await token_metadata.load_async(
+        chain.w3, chain_id, SELA_TOKEN_ADDRESS, SELA_ABI, None if required else SELA_DEFAULT_METADATA
+    )
+
+async def _sela_decimals():
+    """Real token decimals for amount math - raises rather than guess"""
+    return (await get_sela_metadata(required=True))["decimals"]
+
+async def fetch_balances_from_blockchain(checksum_address):
+    """Read BNB and SELA balances straight from the chain (raises on RPC errors)"""
+    # Get BNB and SELA balances concurrently
+    bnb_balance_wei, sela_balance_raw = await asyncio.gather(
+        chain.native_balance(checksum_address),
+        chain.token_balance(checksum_address)
+    )
+    bnb_balance = Web3.from_wei(bnb_balance_wei, 'ether')
+    
+    # Get decimals - use 15 as per your token
+    decimals = await _sela_decimals()
+    
+    sela_balance = sela_balance_raw / (10 ** decimals)
+    
+    logger.info(f"✅ Blockchain balances for {checksum_address}: BNB={float(bnb_balance):.6f}, SELA={float(sela_balance):.6f}")
+    
+    return {
+        "bnb": float(bnb_balance),
+        "sela": float(sela_balance),
+        "registered": True
+    }
+
+# Real balances cache - populated from blockchain, keyed by checksum address
+REAL_BALANCES = BalanceCache(fetch_balances_from_blockchain, ttl=BALANCE_CACHE_TTL, max_entries=BALANCE_CACHE_SIZE)
+
+async def get_real_balances_from_blockchain(wallet_address):
+    """Get REAL balances from blockchain, served from the balance cache when fresh"""
+    try:
+        checksum_address = Web3.to_checksum_address(wallet_address)
+        return await REAL_BALANCES.get(checksum_address)
         
     except Exception as e:
         logger.error(f"❌ Error getting blockchain balances: {e}")
@@ -211,6 +293,56 @@ def get_real_balances_from_blockchain(wallet_address):
             "registered": False
         }
 
+BATCH_BALANCES = BatchBalanceFetcher(
+    chain.w3,
+    chain.token,
+    chunk_size=MULTICALL_CHUNK_SIZE,
+    max_parallel=MULTICALL_MAX_PARALLEL
+)
+
+async def get_balances_batch(checksum_addresses):
+    """Get balances for many wallets via Multicall; wallets whose calls failed map to None"""
+    decimals = await _sela_decimals()
+    generation = REAL_BALANCES.generation()
+    raw_balances = await BATCH_BALANCES.fetch(checksum_addresses)
+    
+    results = {}
+    for checksum_address, raw in raw_balances.items():
+        if raw["native"] is None or raw["token"] is None:
+            results[checksum_address] = None
+            continue
+        
+        balances = {
+            "bnb": float(Web3.from_wei(raw["native"], 'ether')),
+            "sela": raw["token"] / (10 ** decimals),
+            "registered": True
+        }
+        REAL_BALANCES.put(checksum_address, balances, generation)
+        results[checksum_address] = balances
+    
+    return results
+
+def invalidate_balances(*wallet_addresses):
+    """Drop cached balances after a transfer touches these wallets"""
+    for wallet_address in wallet_addresses:
+        if Web3.is_address(wallet_address):
+            REAL_BALANCES.invalidate(Web3.to_checksum_address(wallet_address))
+
+CONFIRMATIONS = ConfirmationTracker(
+    chain,
+    db,
+    TRANSFER_EVENTS,
+    SELA_TOKEN_ADDRESS,
+    _sela_decimals,
+    confirmations=TRANSFER_CONFIRMATIONS,
+    poll_interval=CONFIRMATION_POLL_INTERVAL,
+    batch_size=RECEIPT_BATCH_SIZE,
+    pending_timeout=TRANSFER_PENDING_TIMEOUT,
+    on_settled=lambda events: invalidate_balances(*{
+        address for event in events for address in (event["from"], event["to"])
+    })
+)
+
 @app.get("/wallet/balance/{wallet_address}")
 async def get_wallet_balance(wallet_address: str):
     """Get wallet balance with REAL blockchain data - FIXED VERSION"""
@@ -218,22 +350,14 @@ async def get_wallet_balance(wallet_address: str):
         logger.info(f"🔍 Checking REAL blockchain balance for: {wallet_address}")
         
         # Validate address
-        if not w3.is_address(wallet_address):
+        if not Web3.is_address(wallet_address):
             raise HTTPException(status_code=400, detail="Invalid wallet address")
         
         # Get REAL balances from blockchain
-        balances = get_real_balances_from_blockchain(wallet_address)
-        
-        # Update cache
-        checksum_address = w3.to_checksum_address(wallet_address)
-        REAL_BALANCES[checksum_address] = balances
+        balances = await get_real_balances_from_blockchain(wallet_address)
         
         # Check if wallet is registered in our system
-        conn = sqlite3.connect('data/sela.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE wallet_address = ?', (wallet_address,))
-        user = cursor.fetchone()
-        conn.close()
+        user = await db.fetchone(queries.USER_BY_WALLET, (wallet_address,))
         
         is_registered = user is not None
         
@@ -248,6 +372,8 @@ async def get_wallet_balance(wallet_address: str):
             "timestamp": datetime.now().isoformat()
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ Error getting wallet balance: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -262,44 +388,31 @@ async def register_wallet(wallet_data: dict):
         if not user_id or not wallet_address:
             raise HTTPException(status_code=400, detail="Missing user_id or wallet_address")
         
-        if not w3.is_address(wallet_address):
+        if not Web3.is_address(wallet_address):
             raise HTTPException(status_code=400, detail="Invalid wallet address")
         
         # Get real balances from blockchain to verify the address
-        balances = get_real_balances_from_blockchain(wallet_address)
+        balances = await get_real_balances_from_blockchain(wallet_address)
         
         # Save to database
-        conn = sqlite3.connect('data/sela.db')
-        cursor = conn.cursor()
+        await db.execute(
+            'INSERT OR REPLACE INTO users (user_id, wallet_address) VALUES (?, ?)',
+            (user_id, wallet_address)
+        )
         
-        try:
-            cursor.execute(
-                'INSERT OR REPLACE INTO users (user_id, wallet_address) VALUES (?, ?)',
-                (user_id, wallet_address)
-            )
-            conn.commit()
-            
-            # Update cache with real data
-            checksum_address = w3.to_checksum_address(wallet_address)
-            REAL_BALANCES[checksum_address] = {
-                "bnb": balances["bnb"],
-                "sela": balances["sela"],
-                "registered": True
-            }
-            
-            return {
-                "success": True,
-                "user_id": user_id,
-                "wallet_address": wallet_address,
-                "bnb_balance": balances["bnb"],
-                "sela_balance": balances["sela"],
-                "message": "Wallet registered successfully with real blockchain data",
-                "network": "BSC (Binance Smart Chain)",
-                "chain_id": 56
-            }
-        finally:
-            conn.close()
+        return {
+            "success": True,
+            "user_id": user_id,
+            "wallet_address": wallet_address,
+            "bnb_balance": balances["bnb"],
+            "sela_balance": balances["sela"],
+            "message": "Wallet registered successfully with real blockchain data",
+            "network": "BSC (Binance Smart Chain)",
+            "chain_id": 56
+        }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Wallet registration error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -308,17 +421,12 @@ async def register_wallet(wallet_data: dict):
 async def get_user_wallet(user_id: str):
     """Get user's registered wallet"""
     try:
-        conn = sqlite3.connect('data/sela.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
-        user = cursor.fetchone()
-        conn.close()
+        user = await db.fetchone(queries.USER_BY_ID, (user_id,))
         
         if user:
             wallet_address = user[1]
             # Get real balances for this wallet
-            balances = get_real_balances_from_blockchain(wallet_address)
+            balances = await get_real_balances_from_blockchain(wallet_address)
             
             return {
                 "user_id": user_id,
@@ -367,29 +475,14 @@ async def get_price_config():
 async def get_token_info():
     """Get SELA token information from blockchain"""
     try:
-        contract = w3.eth.contract(
-            address=w3.to_checksum_address(SELA_TOKEN_ADDRESS),
-            abi=SELA_ABI
-        )
-        
-        # Get real token info from blockchain
-        try:
-            symbol = contract.functions.symbol().call()
-        except:
-            symbol = "SLH"
+        # Immutable token info comes from the metadata registry
+        metadata = await get_sela_metadata()
+        symbol = metadata["symbol"]
+        name = metadata["name"]
+        decimals = metadata["decimals"]
             
         try:
-            name = contract.functions.name().call()
-        except:
-            name = "SLH Token"
-            
-        try:
-            decimals = contract.functions.decimals().call()
-        except:
-            decimals = 15  # Your token has 15 decimals
-            
-        try:
-            total_supply = contract.functions.totalSupply().call()
+            total_supply = await chain.token_call("totalSupply")
             total_supply_formatted = total_supply / (10 ** decimals)
         except:
             total_supply_formatted = 200000.0  # Approximate supply
@@ -433,16 +526,12 @@ async def create_order(order_data: dict):
         order_id = f"order_{int(datetime.now().timestamp())}_{user_id}"
         
         # Save to database
-        conn = sqlite3.connect('data/sela.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        await db.execute('''
             INSERT INTO orders (id, user_id, pair, side, price, amount, status)
             VALUES (?, ?, ?, ?, ?, ?, ?)
         ''', (order_id, user_id, pair, side, price, amount, 'open'))
         
-        conn.commit()
-        conn.close()
+        ORDERBOOK_DEPTH.order_created(pair, side, price, amount)
         
         return {
             "success": True,
@@ -457,96 +546,81 @@ async def create_order(order_data: dict):
             "timestamp": datetime.now().isoformat()
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Order creation error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/orderbook/{pair}")
-async def get_orderbook(pair: str):
-    """Get orderbook for trading pair"""
-    try:
-        conn = sqlite3.connect('data/sela.db')
-        cursor = conn.cursor()
-        
-        # Get open orders for this pair
-        cursor.execute('''
-            SELECT * FROM orders 
-            WHERE pair = ? AND status = 'open'
-            ORDER BY price DESC
-        ''', (pair,))
-        
-        orders = cursor.fetchall()
-        conn.close()
-        
-        bids = []
-        asks = []
-        
-        for order in orders:
-            order_data = {
-                "id": order[0],
-                "price": order[4],
-                "amount": order[5],
-                "filled": order[6]
-            }
-            
-            if order[3] == 'buy':  # side
-                bids.append(order_data)
-            else:
-                asks.append(order_data)
-        
-        return {
-            "pair": pair,
-            "bids": bids[:20],  # Top 20 bids
-            "asks": asks[:20],  # Top 20 asks
-            "network": "BSC",
-            "timestamp": datetime.now().isoformat()
-        }
-    except Exception as e:
-        logger.error(f"Orderbook error: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+async def get_orderbook(pair: str, depth: int = 20):
+    """Get aggregated orderbook depth for trading pair"""
+    if depth < 1 or depth > MAX_ORDERBOOK_DEPTH:
+        raise HTTPException(status_code=400, detail=f"depth must be between 1 and {MAX_ORDERBOOK_DEPTH}")
+    
+    snapshot = ORDERBOOK_DEPTH.snapshot(pair, depth)
+    return {
+        "pair": pair,
+        "seq": snapshot["seq"],
+        "bids": snapshot["bids"],
+        "asks": snapshot["asks"],
+        "depth": depth,
+        "network": "BSC",
+        "timestamp": datetime.now().isoformat()
+    }
+
+def order_to_dict(order) -> Dict[str, Any]:
+    return {
+        "id": order[0],
+        "pair": order[2],
+        "side": order[3],
+        "price": order[4],
+        "amount": order[5],
+        "filled": order[6],
+        "status": order[7],
+        "created_at": order[8]
+    }
+
+def _check_page_size(limit: int):
+    if limit < 1 or limit > MAX_HISTORY_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_HISTORY_PAGE_SIZE}")
+
+def _ndjson_response(sql: str, params: tuple, to_dict) -> StreamingResponse:
+    """Stream every row of a history query as NDJSON straight from the SQLite cursor"""
+    return StreamingResponse(ndjson_lines(db.stream(sql, params), to_dict), media_type="application/x-ndjson")
 
 @app.get("/user/orders/{user_id}")
-async def get_user_orders(user_id: str, status: str = None):
-    """Get user's orders"""
+async def get_user_orders(user_id: str, status: str = None, cursor: str = None,
+                          limit: int = DEFAULT_ORDERS_PAGE_SIZE, format: str = "json"):
+    """Get user's orders, newest first; pass next_cursor to continue or format=ndjson to export"""
     try:
-        conn = sqlite3.connect('data/sela.db')
-        cursor = conn.cursor()
+        try:
+            before = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         if status:
-            cursor.execute('''
-                SELECT * FROM orders 
-                WHERE user_id = ? AND status = ?
-                ORDER BY created_at DESC
-            ''', (user_id, status))
+            sql, params = queries.ORDERS_BY_USER_AND_STATUS, (user_id, status, *before)
         else:
-            cursor.execute('''
-                SELECT * FROM orders 
-                WHERE user_id = ? 
-                ORDER BY created_at DESC
-            ''', (user_id,))
-        
-        orders = cursor.fetchall()
-        conn.close()
-        
-        orders_list = []
-        for order in orders:
-            orders_list.append({
-                "id": order[0],
-                "pair": order[2],
-                "side": order[3],
-                "price": order[4],
-                "amount": order[5],
-                "filled": order[6],
-                "status": order[7],
-                "created_at": order[8]
-            })
+            sql, params = queries.ORDERS_BY_USER, (user_id, *before)
+        
+        if format == "ndjson":
+            return _ndjson_response(sql, params + (-1,), order_to_dict)
+        
+        _check_page_size(limit)
+        orders = await db.fetchall(sql, params + (limit + 1,))
+        has_more = len(orders) > limit
+        orders = orders[:limit]
         
         return {
             "user_id": user_id,
-            "orders": orders_list,
+            "orders": [order_to_dict(order) for order in orders],
+            "next_cursor": encode_cursor(orders[-1][8], orders[-1][0]) if has_more else None,
             "network": "BSC",
-            "count": len(orders_list)
+            "count": len(orders)
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"User orders error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -561,20 +635,28 @@ async def cancel_order(cancel_data: dict):
         if not order_id or not user_id:
             raise HTTPException(status_code=400, detail="Missing order_id or user_id")
         
-        conn = sqlite3.connect('data/sela.db')
-        cursor = conn.cursor()
-        
-        # Verify order belongs to user
-        cursor.execute('SELECT * FROM orders WHERE id = ? AND user_id = ?', (order_id, user_id))
-        order = cursor.fetchone()
+        def cancel(conn):
+            # Guarded on status so of two concurrent cancels only one moves the order
+            # out of 'open' (and updates the depth); the row is then read inside the
+            # same write transaction
+            cancelled = conn.execute(
+                "UPDATE orders SET status = 'cancelled' WHERE id = ? AND user_id = ? AND status = 'open'",
+                (order_id, user_id)
+            ).rowcount == 1
+            order = conn.execute(
+                'SELECT * FROM orders WHERE id = ? AND user_id = ?', (order_id, user_id)
+            ).fetchone()
+            return order, cancelled
+        
+        order, cancelled = await db.run(cancel)
         
         if not order:
             raise HTTPException(status_code=404, detail="Order not found")
         
-        # Update order status
-        cursor.execute('UPDATE orders SET status = ? WHERE id = ?', ('cancelled', order_id))
-        conn.commit()
-        conn.close()
+        if cancelled:
+            ORDERBOOK_DEPTH.order_cancelled(order[2], order[3], order[4], order[5] - order[6])
+        elif order[7] != 'cancelled':
+            raise HTTPException(status_code=400, detail=f"Order is {order[7]}")
         
         return {
             "success": True,
@@ -584,6 +666,8 @@ async def cancel_order(cancel_data: dict):
             "network": "BSC"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Cancel order error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -600,28 +684,35 @@ async def transfer_sela(transfer_data: dict):
         if not all([from_address, to_address, amount]):
             raise HTTPException(status_code=400, detail="Missing required fields")
         
-        if amount <= 0:
+        if not math.isfinite(amount) or amount <= 0:
             raise HTTPException(status_code=400, detail="Amount must be positive")
         
+        if transfer_data.get('tx_hash') is not None and not is_tx_hash(transfer_data['tx_hash']):
+            raise HTTPException(status_code=400, detail="Invalid tx_hash")
+        
         # Check if sender has enough balance using real blockchain data
-        sender_balances = get_real_balances_from_blockchain(from_address)
+        sender_balances = await get_real_balances_from_blockchain(from_address)
         if sender_balances["sela"] < amount:
             raise HTTPException(status_code=400, detail="Insufficient SELA balance")
         
-        # Record transfer in database (simulated - in real implementation would use blockchain)
-        transfer_id = f"transfer_{int(datetime.now().timestamp())}"
-        tx_hash = f"0x{os.urandom(32).hex()}"
+        # An on-chain tx_hash is followed to confirmation; without one the transfer is simulated
+        transfer_id = new_transfer_id()
+        client_tx_hash = (transfer_data.get('tx_hash') or "").lower() or None
+        tx_hash = client_tx_hash or new_tx_hash()
+        status = transfer_status(client_tx_hash)
         
-        conn = sqlite3.connect('data/sela.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO transfers (id, from_address, to_address, token, amount, tx_hash, status)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (transfer_id, from_address, to_address, "SELA", amount, tx_hash, "completed"))
-        
-        conn.commit()
-        conn.close()
+        try:
+            await db.execute('''
+                INSERT INTO transfers (id, from_address, to_address, token, amount, tx_hash, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (transfer_id, from_address, to_address, "SELA", amount, tx_hash, status))
+        except sqlite3.IntegrityError:
+            raise HTTPException(status_code=409, detail="tx_hash already recorded")
+        
+        invalidate_balances(from_address, to_address)
+        TRANSFER_EVENTS.publish(transfer_event(
+            (transfer_id, from_address, to_address, "SELA", amount, tx_hash), status
+        ))
         
         logger.info(f"✅ SELA Transfer: {from_address} -> {to_address} ({amount} SELA)")
         
@@ -632,12 +723,14 @@ async def transfer_sela(transfer_data: dict):
             "amount": amount,
             "token": "SELA",
             "transaction_hash": tx_hash,
-            "status": "completed",
+            "status": status,
             "network": "BSC (Binance Smart Chain)",
             "chain_id": 56,
             "timestamp": datetime.now().isoformat()
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ SELA Transfer error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -653,28 +746,35 @@ async def transfer_bnb(transfer_data: dict):
         if not all([from_address, to_address, amount]):
             raise HTTPException(status_code=400, detail="Missing required fields")
         
-        if amount <= 0:
+        if not math.isfinite(amount) or amount <= 0:
             raise HTTPException(status_code=400, detail="Amount must be positive")
         
+        if transfer_data.get('tx_hash') is not None and not is_tx_hash(transfer_data['tx_hash']):
+            raise HTTPException(status_code=400, detail="Invalid tx_hash")
+        
         # Check if sender has enough balance using real blockchain data
-        sender_balances = get_real_balances_from_blockchain(from_address)
+        sender_balances = await get_real_balances_from_blockchain(from_address)
         if sender_balances["bnb"] < amount:
             raise HTTPException(status_code=400, detail="Insufficient BNB balance")
         
-        # Record transfer in database (simulated - in real implementation would use blockchain)
-        transfer_id = f"transfer_{int(datetime.now().timestamp())}"
-        tx_hash = f"0x{os.urandom(32).hex()}"
-        
-        conn = sqlite3.connect('data/sela.db')
-        cursor = conn.cursor()
+        # An on-chain tx_hash is followed to confirmation; without one the transfer is simulated
+        transfer_id = new_transfer_id()
+        client_tx_hash = (transfer_data.get('tx_hash') or "").lower() or None
+        tx_hash = client_tx_hash or new_tx_hash()
+        status = transfer_status(client_tx_hash)
         
-        cursor.execute('''
-            INSERT INTO transfers (id, from_address, to_address, token, amount, tx_hash, status)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (transfer_id, from_address, to_address, "BNB", amount, tx_hash, "completed"))
-        
-        conn.commit()
-        conn.close()
+        try:
+            await db.execute('''
+                INSERT INTO transfers (id, from_address, to_address, token, amount, tx_hash, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (transfer_id, from_address, to_address, "BNB", amount, tx_hash, status))
+        except sqlite3.IntegrityError:
+            raise HTTPException(status_code=409, detail="tx_hash already recorded")
+        
+        invalidate_balances(from_address, to_address)
+        TRANSFER_EVENTS.publish(transfer_event(
+            (transfer_id, from_address, to_address, "BNB", amount, tx_hash), status
+        ))
         
         logger.info(f"✅ BNB Transfer: {from_address} -> {to_address} ({amount} BNB)")
         
@@ -685,56 +785,241 @@ async def transfer_bnb(transfer_data: dict):
             "amount": amount,
             "token": "BNB",
             "transaction_hash": tx_hash,
-            "status": "completed",
+            "status": status,
             "network": "BSC (Binance Smart Chain)",
             "chain_id": 56,
             "timestamp": datetime.now().isoformat()
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ BNB Transfer error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def recorded_tx_hashes(tx_hashes):
+    """The hashes among tx_hashes that already have a transfer row"""
+    tx_hashes = list(tx_hashes)
+    recorded = set()
+    for start in range(0, len(tx_hashes), 500):
+        chunk = tx_hashes[start:start + 500]
+        placeholders = ",".join("?" * len(chunk))
+        rows = await db.fetchall(f"SELECT tx_hash FROM transfers WHERE tx_hash IN ({placeholders})", chunk)
+        recorded.update(row[0] for row in rows)
+    return recorded
+
+@app.post("/transfers/batch")
+async def transfer_batch(batch_data: dict):
+    """Submit many SELA/BNB transfers at once (payouts, airdrops)"""
+    try:
+        items = batch_data.get('transfers')
+        
+        if not isinstance(items, list) or not items:
+            raise HTTPException(status_code=400, detail="Missing transfers")
+        
+        if len(items) > MAX_BATCH_TRANSFERS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_TRANSFERS} transfers per request")
+        
+        parsed = [parse_transfer(item) for item in items]
+        transfers = [transfer for transfer, _ in parsed]
+        errors = [error for _, error in parsed]
+        
+        # Each on-chain transaction can back only one transfer row
+        recorded = await recorded_tx_hashes(tx_hashes_of(transfers))
+        for index, transfer in enumerate(transfers):
+            if transfer is not None and transfer["tx_hash"] in recorded:
+                transfers[index] = None
+                errors[index] = "tx_hash already recorded"
+        
+        # One Multicall pass for all senders, then funds are checked per sender in aggregate
+        senders = senders_of(transfers)
+        balances = await get_balances_batch(list(senders)) if senders else {}
+        rows, results = plan_batch(transfers, errors, balances)
+        
+        # One transaction for the whole batch: either every accepted row is
+        # written or none is, so a failed request can simply be retried
+        try:
+            await db.executemany('''
+                INSERT INTO transfers (id, from_address, to_address, token, amount, tx_hash, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+        except sqlite3.IntegrityError:
+            raise HTTPException(status_code=409, detail="A tx_hash in the batch was recorded concurrently")
+        
+        invalidate_balances(*{address for row in rows for address in (row[1], row[2])})
+        for row in rows:
+            TRANSFER_EVENTS.publish(transfer_event(row, row[6]))
+        
+        logger.info(f"✅ Batch transfer: {len(rows)} accepted, {len(items) - len(rows)} rejected")
+        
+        return {
+            "results": results,
+            "accepted": len(rows),
+            "rejected": len(items) - len(rows),
+            "network": "BSC (Binance Smart Chain)",
+            "chain_id": 56,
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Batch transfer error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def transfer_to_dict(transfer) -> Dict[str, Any]:
+    return {
+        "id": transfer[0],
+        "from": transfer[1],
+        "to": transfer[2],
+        "token": transfer[3],
+        "amount": transfer[4],
+        "tx_hash": transfer[5],
+        "status": transfer[6],
+        "created_at": transfer[7],
+        "block_number": transfer[8]
+    }
+
 @app.get("/transfers/{wallet_address}")
-async def get_wallet_transfers(wallet_address: str, limit: int = 10):
-    """Get transfer history for wallet"""
+async def get_wallet_transfers(wallet_address: str, cursor: str = None, limit: int = 10,
+                               format: str = "json"):
+    """Get transfer history for wallet, newest first; pass next_cursor to continue or format=ndjson to export"""
     try:
-        conn = sqlite3.connect('data/sela.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM transfers 
-            WHERE from_address = ? OR to_address = ?
-            ORDER BY created_at DESC 
-            LIMIT ?
-        ''', (wallet_address, wallet_address, limit))
-        
-        transfers = cursor.fetchall()
-        conn.close()
-        
-        transfers_list = []
-        for transfer in transfers:
-            transfers_list.append({
-                "id": transfer[0],
-                "from": transfer[1],
-                "to": transfer[2],
-                "token": transfer[3],
-                "amount": transfer[4],
-                "tx_hash": transfer[5],
-                "status": transfer[6],
-                "created_at": transfer[7]
-            })
+        try:
+            before = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        params = (wallet_address, *before, wallet_address, wallet_address, *before)
+        
+        if format == "ndjson":
+            return _ndjson_response(queries.TRANSFERS_BY_WALLET, params + (-1,), transfer_to_dict)
+        
+        _check_page_size(limit)
+        transfers = await db.fetchall(queries.TRANSFERS_BY_WALLET, params + (limit + 1,))
+        has_more = len(transfers) > limit
+        transfers = transfers[:limit]
         
         return {
             "wallet_address": wallet_address,
-            "transfers": transfers_list,
+            "transfers": [transfer_to_dict(transfer) for transfer in transfers],
+            "next_cursor": encode_cursor(transfers[-1][7], transfers[-1][0]) if has_more else None,
             "network": "BSC",
-            "count": len(transfers_list)
+            "count": len(transfers)
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Transfers history error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/transfers/{wallet_address}/events")
+async def transfer_events(wallet_address: str):
+    """Server-sent events with status changes of this wallet's transfers"""
+    if not Web3.is_address(wallet_address):
+        raise HTTPException(status_code=400, detail="Invalid wallet address")
+    
+    return StreamingResponse(
+        TRANSFER_EVENTS.stream(wallet_address, keepalive=SSE_KEEPALIVE),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _require_indexer() -> TransferIndexer:
+    if TRANSFER_INDEXER is None:
+        raise HTTPException(status_code=503, detail="Transfer indexer is not enabled")
+    return TRANSFER_INDEXER
+
+@app.get("/index/status")
+async def get_index_status():
+    """Progress of the SELA Transfer log indexer"""
+    return await _require_indexer().status()
+
+@app.get("/index/balance/{wallet_address}")
+async def get_indexed_balance(wallet_address: str):
+    """SELA balance summed from indexed Transfer logs - no RPC calls"""
+    try:
+        indexer = _require_indexer()
+        
+        if not Web3.is_address(wallet_address):
+            raise HTTPException(status_code=400, detail="Invalid wallet address")
+        
+        checksum_address = Web3.to_checksum_address(wallet_address)
+        row = await db.fetchone(queries.INDEXED_BALANCE, (checksum_address,))
+        checkpoint = await indexer.checkpoint()
+        balance_raw = int(row[0]) if row else 0
+        decimals = await _sela_decimals()
+        
+        return {
+            "wallet_address": checksum_address,
+            "sela_balance": balance_raw / (10 ** decimals),
+            "sela_balance_raw": str(balance_raw),
+            "indexed_block": checkpoint[0] if checkpoint else None,
+            "network": "BSC (Binance Smart Chain)",
+            "chain_id": 56
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Indexed balance error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/index/transfers/{wallet_address}")
+async def get_indexed_transfers(wallet_address: str, cursor: str = None, limit: int = 50):
+    """On-chain SELA transfers of a wallet, newest first; pass next_cursor to continue"""
+    try:
+        _require_indexer()
+        
+        if not Web3.is_address(wallet_address):
+            raise HTTPException(status_code=400, detail="Invalid wallet address")
+        
+        _check_page_size(limit)
+        
+        # Cursor is "<block_number>:<log_index>" of the last row already returned
+        before = (2 ** 63 - 1, 0)
+        if cursor:
+            try:
+                block_number, log_index = cursor.split(":")
+                before = (int(block_number), int(log_index))
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+        
+        checksum_address = Web3.to_checksum_address(wallet_address)
+        rows = await db.fetchall(
+            queries.INDEXED_TRANSFERS_BY_WALLET,
+            (checksum_address, *before, checksum_address, checksum_address, *before, limit + 1)
+        )
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        decimals = await _sela_decimals()
+        
+        return {
+            "wallet_address": checksum_address,
+            "transfers": [
+                {
+                    "block_number": row[0],
+                    "log_index": row[1],
+                    "tx_hash": row[2],
+                    "from": row[3],
+                    "to": row[4],
+                    "amount": int(row[5]) / (10 ** decimals),
+                    "amount_raw": row[5]
+                }
+                for row in rows
+            ],
+            "next_cursor": f"{rows[-1][0]}:{rows[-1][1]}" if has_more else None,
+            "count": len(rows),
+            "network": "BSC"
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Indexed transfers error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/trading/pairs")
 async def get_trading_pairs():
     """Get available trading pairs"""
@@ -761,24 +1046,72 @@ async def get_trading_pairs():
         "timestamp": datetime.now().isoformat()
     }
 
+@app.post("/wallet/balances")
+async def get_wallet_balances(request_data: dict):
+    """Get balances for many wallets in batched blockchain calls"""
+    try:
+        addresses = request_data.get('addresses')
+        
+        if not isinstance(addresses, list) or not addresses:
+            raise HTTPException(status_code=400, detail="Missing addresses")
+        
+        if len(addresses) > MAX_BATCH_WALLETS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_WALLETS} addresses per request")
+        
+        invalid = [address for address in addresses if not Web3.is_address(address)]
+        checksum_addresses = [Web3.to_checksum_address(address) for address in addresses if Web3.is_address(address)]
+        
+        results = await get_balances_batch(checksum_addresses)
+        
+        balances = {}
+        failed = []
+        for checksum_address, result in results.items():
+            if result is None:
+                failed.append(checksum_address)
+            else:
+                balances[checksum_address] = {
+                    "bnb_balance": result["bnb"],
+                    "sela_balance": result["sela"]
+                }
+        
+        return {
+            "balances": balances,
+            "invalid": invalid,
+            "failed": failed,
+            "count": len(balances),
+            "network": "BSC (Binance Smart Chain)",
+            "chain_id": 56,
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Batch balances error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/system/balances")
 async def get_system_balances():
     """Get system balances (for admin)"""
     try:
         # Get all registered wallets from database
-        conn = sqlite3.connect('data/sela.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT wallet_address FROM users')
-        wallets = cursor.fetchall()
-        conn.close()
+        wallets = await db.fetchall('SELECT wallet_address FROM users')
         
-        total_sela = 0.0
-        total_bnb = 0.0
+        checksum_addresses = [
+            Web3.to_checksum_address(wallet[0]) for wallet in wallets
+            if wallet[0] and Web3.is_address(wallet[0])
+        ]
         
         # Sum up balances from blockchain for all registered wallets
-        for wallet in wallets:
-            wallet_address = wallet[0]
-            balances = get_real_balances_from_blockchain(wallet_address)
+        results = await get_balances_batch(checksum_addresses)
+        
+        total_sela = 0.0
+        total_bnb = 0.0
+        failed_wallets = 0
+        for balances in results.values():
+            if balances is None:
+                failed_wallets += 1
+                continue
             total_sela += balances["sela"]
             total_bnb += balances["bnb"]
         
@@ -787,6 +1120,7 @@ async def get_system_balances():
             "registered_users": len(wallets),
             "total_sela": total_sela,
             "total_bnb": total_bnb,
+            "failed_wallets": failed_wallets,
             "network": "BSC",
             "timestamp": datetime.now().isoformat()
         }
@@ -794,6 +1128,24 @@ async def get_system_balances():
         logger.error(f"System balances error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.on_event("startup")
+async def open_chain_client():
+    await chain.connect()
+    await get_sela_metadata()
+    HEALTH_MONITOR.start()
+    CONFIRMATIONS.start()
+    if TRANSFER_INDEXER is not None:
+        TRANSFER_INDEXER.start()
+
+@app.on_event("shutdown")
+async def close_connections():
+    if TRANSFER_INDEXER is not None:
+        await TRANSFER_INDEXER.stop()
+    await CONFIRMATIONS.stop()
+    await HEALTH_MONITOR.stop()
+    await chain.close()
+    db.close()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
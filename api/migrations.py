@@ -0,0 +1,193 @@
+import sys
+import logging
+import sqlite3
+from typing import List, Tuple
+
+import queries
+
+logger = logging.getLogger(__name__)
+
+# Ordered (version, description, statements). Applied migrations are tracked
+# in PRAGMA user_version; never edit a released entry, append a new one.
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "base tables", [
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id TEXT PRIMARY KEY,
+            wallet_address TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS orders (
+            id TEXT PRIMARY KEY,
+            user_id TEXT,
+            pair TEXT,
+            side TEXT,
+            price REAL,
+            amount REAL,
+            filled REAL DEFAULT 0,
+            status TEXT DEFAULT 'open',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS transfers (
+            id TEXT PRIMARY KEY,
+            from_address TEXT,
+            to_address TEXT,
+            token TEXT,
+            amount REAL,
+            tx_hash TEXT,
+            status TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ]),
+    (2, "indexes for order, user and transfer lookups", [
+        # Covers the open-order depth load and per-pair open order reads
+        '''
+        CREATE INDEX IF NOT EXISTS idx_orders_status_pair_side_price
+        ON orders (status, pair, side, price, amount, filled)
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_orders_user_created ON orders (user_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_users_wallet ON users (wallet_address)',
+        'CREATE INDEX IF NOT EXISTS idx_transfers_from_created ON transfers (from_address, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_transfers_to_created ON transfers (to_address, created_at)',
+    ]),
+    (3, "block number and pending index for transfer confirmations", [
+        'ALTER TABLE transfers ADD COLUMN block_number INTEGER',
+        # Partial index - only the few transfers still waiting for confirmation
+        "CREATE INDEX IF NOT EXISTS idx_transfers_pending ON transfers (created_at) WHERE status = 'pending'",
+    ]),
+    (4, "token transfer log index", [
+        # uint256 values and balances don't fit SQLite integers - stored as decimal text
+        '''
+        CREATE TABLE IF NOT EXISTS token_transfers (
+            block_number INTEGER NOT NULL,
+            log_index INTEGER NOT NULL,
+            tx_hash TEXT NOT NULL,
+            from_address TEXT NOT NULL,
+            to_address TEXT NOT NULL,
+            value TEXT NOT NULL,
+            PRIMARY KEY (block_number, log_index)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_token_transfers_from ON token_transfers (from_address, block_number, log_index)',
+        'CREATE INDEX IF NOT EXISTS idx_token_transfers_to ON token_transfers (to_address, block_number, log_index)',
+        '''
+        CREATE TABLE IF NOT EXISTS token_balances (
+            address TEXT PRIMARY KEY,
+            balance TEXT NOT NULL
+        )
+        ''',
+        # Checkpoint plus recent block hashes for reorg detection
+        '''
+        CREATE TABLE IF NOT EXISTS indexed_blocks (
+            block_number INTEGER PRIMARY KEY,
+            block_hash TEXT NOT NULL
+        )
+        ''',
+    ]),
+    (5, "keyset pagination indexes on (created_at, id)", [
+        # id breaks created_at ties, so pages walk the index without a sort
+        'CREATE INDEX IF NOT EXISTS idx_orders_user_created_id ON orders (user_id, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_transfers_from_created_id ON transfers (from_address, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_transfers_to_created_id ON transfers (to_address, created_at, id)',
+        'DROP INDEX IF EXISTS idx_orders_user_created',
+        'DROP INDEX IF EXISTS idx_transfers_from_created',
+        'DROP INDEX IF EXISTS idx_transfers_to_created',
+    ]),
+    (6, "one transfer row per on-chain transaction", [
+        # A confirmed tx_hash can only ever back a single transfer
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_transfers_tx_hash ON transfers (tx_hash)',
+    ]),
+]
+
+# (name, sql, params, indexes the plan must use)
+QUERY_PLAN_CHECKS = [
+    ("user by id", queries.USER_BY_ID, ("u",), ["sqlite_autoindex_users_1"]),
+    ("user by wallet", queries.USER_BY_WALLET, ("0x",), ["idx_users_wallet"]),
+    ("open order depth", queries.OPEN_ORDER_DEPTH, (), ["idx_orders_status_pair_side_price"]),
+    ("orders by user", queries.ORDERS_BY_USER, ("u", *queries.KEYSET_START, 10), ["idx_orders_user_created_id"]),
+    ("orders by user and status", queries.ORDERS_BY_USER_AND_STATUS, ("u", "open", *queries.KEYSET_START, 10),
+     ["idx_orders_user_created_id"]),
+    ("transfers by wallet", queries.TRANSFERS_BY_WALLET,
+     ("0x", *queries.KEYSET_START, "0x", "0x", *queries.KEYSET_START, 10),
+     ["idx_transfers_from_created_id", "idx_transfers_to_created_id"]),
+    ("pending transfers", queries.PENDING_TRANSFERS, (), ["idx_transfers_pending"]),
+    ("indexed balance", queries.INDEXED_BALANCE, ("0x",), ["sqlite_autoindex_token_balances_1"]),
+    ("indexed transfers by wallet", queries.INDEXED_TRANSFERS_BY_WALLET,
+     ("0x", 10, 0, "0x", "0x", 10, 0, 10),
+     ["idx_token_transfers_from", "idx_token_transfers_to"]),
+]
+
+
+class QueryPlanError(Exception):
+    """A hot query no longer uses the indexes it was written for"""
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Apply pending migrations, each in its own transaction; returns the new version"""
+    current = schema_version(conn)
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+
+        conn.execute("BEGIN")
+        try:
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        current = version
+        logger.info(f"✅ Applied migration {version}: {description}")
+
+    return current
+
+
+def check_query_plans(conn: sqlite3.Connection) -> List[str]:
+    """Return a description of every hot query that no longer uses its indexes"""
+    problems = []
+    for name, sql, params, indexes in QUERY_PLAN_CHECKS:
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        # "SCAN (subquery-N)" walks an already bounded result and is fine
+        scans = [
+            step for step in plan
+            if step.startswith("SCAN ") and not step.startswith("SCAN (") and "INDEX" not in step
+        ]
+        # History queries stream rows in index order; a sort step means they no longer do
+        sorts = [step for step in plan if "TEMP B-TREE FOR ORDER BY" in step]
+        missing = [index for index in indexes if not any(index in step for step in plan)]
+        if scans or sorts or missing:
+            problems.append(f"{name}: {' | '.join(plan)}")
+    return problems
+
+
+def assert_query_plans(conn: sqlite3.Connection):
+    """Raise QueryPlanError listing every hot query that no longer uses its indexes"""
+    problems = check_query_plans(conn)
+    if problems:
+        raise QueryPlanError("Query plan regression:\n" + "\n".join(problems))
+
+
+if __name__ == "__main__":
+    # Query-plan regression check against a scratch database:
+    #   python migrations.py
+    logging.basicConfig(level=logging.INFO)
+    scratch = sqlite3.connect(":memory:")
+    migrate(scratch)
+    try:
+        assert_query_plans(scratch)
+    except QueryPlanError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"✅ {len(QUERY_PLAN_CHECKS)} query plans use their indexes")
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from eth_abi import decode
+from web3 import AsyncWeb3, Web3
+
+logger = logging.getLogger(__name__)
+
+# Multicall3 is deployed at the same address on BSC, Ethereum and most EVM chains
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+MULTICALL3_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"name": "target", "type": "address"},
+                    {"name": "allowFailure", "type": "bool"},
+                    {"name": "callData", "type": "bytes"}
+                ],
+                "name": "calls",
+                "type": "tuple[]"
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"name": "success", "type": "bool"},
+                    {"name": "returnData", "type": "bytes"}
+                ],
+                "name": "returnData",
+                "type": "tuple[]"
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function"
+    },
+    {
+        "inputs": [{"name": "addr", "type": "address"}],
+        "name": "getEthBalance",
+        "outputs": [{"name": "balance", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function"
+    }
+]
+
+
+def _decode_uint(success: bool, data: bytes) -> Optional[int]:
+    if not success or len(data) < 32:
+        return None
+    return decode(["uint256"], data)[0]
+
+
+class BatchBalanceFetcher:
+    """Fetch native and token balances for many wallets through Multicall3
+
+    Each chunk of wallets becomes one eth_call carrying a getEthBalance and a
+    balanceOf per wallet; chunks run with bounded parallelism.
+    """
+
+    def __init__(self, w3: AsyncWeb3, token_contract, chunk_size: int = 250, max_parallel: int = 4):
+        self.w3 = w3
+        self.token = token_contract
+        self.multicall = w3.eth.contract(
+            address=Web3.to_checksum_address(MULTICALL3_ADDRESS),
+            abi=MULTICALL3_ABI
+        )
+        self.chunk_size = chunk_size
+        self.max_parallel = max_parallel
+
+    def _calls_for(self, addresses: List[str]) -> List[tuple]:
+        calls = []
+        for address in addresses:
+            calls.append((
+                self.multicall.address, True,
+                self.multicall.encodeABI(fn_name="getEthBalance", args=[address])
+            ))
+            calls.append((
+                self.token.address, True,
+                self.token.encodeABI(fn_name="balanceOf", args=[address])
+            ))
+        return calls
+
+    async def fetch_chunk(self, addresses: List[str]) -> Dict[str, Dict[str, Optional[int]]]:
+        """Raw balances (wei / token base units) for one chunk of checksum addresses"""
+        results = await self.multicall.functions.aggregate3(self._calls_for(addresses)).call()
+        balances = {}
+        for index, address in enumerate(addresses):
+            native_ok, native_data = results[2 * index]
+            token_ok, token_data = results[2 * index + 1]
+            balances[address] = {
+                "native": _decode_uint(native_ok, native_data),
+                "token": _decode_uint(token_ok, token_data)
+            }
+        return balances
+
+    async def fetch(self, addresses: List[str]) -> Dict[str, Dict[str, Optional[int]]]:
+        """Raw balances for any number of checksum addresses; failed chunks map to None"""
+        unique = list(dict.fromkeys(addresses))
+        chunks = [unique[i:i + self.chunk_size] for i in range(0, len(unique), self.chunk_size)]
+        semaphore = asyncio.Semaphore(self.max_parallel)
+
+        async def run(chunk: List[str]) -> Dict[str, Dict[str, Optional[int]]]:
+            async with semaphore:
+                try:
+                    return await self.fetch_chunk(chunk)
+                except Exception as e:
+                    logger.error(f"❌ Multicall chunk of {len(chunk)} wallets failed: {e}")
+                    return {address: {"native": None, "token": None} for address in chunk}
+
+        balances: Dict[str, Dict[str, Any]] = {}
+        for result in await asyncio.gather(*(run(chunk) for chunk in chunks)):
+            balances.update(result)
+        return balances
@@ -0,0 +1,31 @@
+import json
+import base64
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
+import queries
+
+
+def encode_cursor(created_at: str, row_id: str) -> str:
+    """Opaque cursor for the (created_at, id) of the last row on a page"""
+    raw = json.dumps([created_at, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Tuple[str, str]:
+    """(created_at, id) to continue after; raises ValueError for a malformed cursor"""
+    if not cursor:
+        return queries.KEYSET_START
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(created_at, str) or not isinstance(row_id, str):
+        raise ValueError("Invalid cursor")
+    return created_at, row_id
+
+
+async def ndjson_lines(rows: AsyncIterator[tuple],
+                       to_dict: Callable[[tuple], Dict[str, Any]]) -> AsyncIterator[str]:
+    """One JSON document per line, encoded as the rows arrive"""
+    async for row in rows:
+        yield json.dumps(to_dict(row)) + "\n"
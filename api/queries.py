@@ -0,0 +1,73 @@
+# Hot read queries shared by the endpoints and the query-plan checks in
+# migrations.py, so the checked SQL is exactly the SQL that runs.
+
+USER_BY_ID = 'SELECT * FROM users WHERE user_id = ?'
+
+USER_BY_WALLET = 'SELECT * FROM users WHERE wallet_address = ?'
+
+OPEN_ORDER_DEPTH = '''
+    SELECT pair, side, price, SUM(amount - filled), COUNT(*)
+    FROM orders
+    WHERE status = 'open'
+    GROUP BY pair, side, price
+'''
+
+# History reads are newest first with a keyset cursor on (created_at, id):
+# rows strictly before the last one already returned. KEYSET_START comes
+# before every row (created_at must stay text for the comparison, a bare
+# number would be compared numerically). Pass LIMIT -1 for all rows.
+KEYSET_START = ("9999-12-31 23:59:59", "")
+
+ORDERS_BY_USER = '''
+    SELECT * FROM orders
+    WHERE user_id = ? AND (created_at, id) < (?, ?)
+    ORDER BY created_at DESC, id DESC
+    LIMIT ?
+'''
+
+ORDERS_BY_USER_AND_STATUS = '''
+    SELECT * FROM orders
+    WHERE user_id = ? AND status = ? AND (created_at, id) < (?, ?)
+    ORDER BY created_at DESC, id DESC
+    LIMIT ?
+'''
+
+# Two index walks merged in order instead of one OR that scans the table,
+# so rows stream without a sort; the second branch skips self-transfers
+# already returned by the first.
+TRANSFERS_BY_WALLET = '''
+    SELECT * FROM transfers
+    WHERE from_address = ? AND (created_at, id) < (?, ?)
+    UNION ALL
+    SELECT * FROM transfers
+    WHERE to_address = ? AND from_address IS NOT ? AND (created_at, id) < (?, ?)
+    ORDER BY created_at DESC, id DESC
+    LIMIT ?
+'''
+
+# Transfers still waiting for on-chain confirmation, with their age in seconds
+PENDING_TRANSFERS = '''
+    SELECT id, from_address, to_address, token, amount, tx_hash, block_number,
+           (julianday('now') - julianday(created_at)) * 86400
+    FROM transfers
+    WHERE status = 'pending'
+'''
+
+UPDATE_TRANSFER_STATUS = 'UPDATE transfers SET status = ?, block_number = ? WHERE id = ?'
+
+# Transfer log index (indexer.py)
+INDEXER_CHECKPOINT = 'SELECT block_number, block_hash FROM indexed_blocks ORDER BY block_number DESC LIMIT 1'
+
+INDEXED_BALANCE = 'SELECT balance FROM token_balances WHERE address = ?'
+
+# Newest first, keyset cursor on (block_number, log_index); same merged
+# shape as TRANSFERS_BY_WALLET
+INDEXED_TRANSFERS_BY_WALLET = '''
+    SELECT * FROM token_transfers
+    WHERE from_address = ? AND (block_number, log_index) < (?, ?)
+    UNION ALL
+    SELECT * FROM token_transfers
+    WHERE to_address = ? AND from_address IS NOT ? AND (block_number, log_index) < (?, ?)
+    ORDER BY block_number DESC, log_index DESC
+    LIMIT ?
+'''
@@ -0,0 +1,332 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+import requests
+from web3.exceptions import ProviderConnectionError
+from web3.providers import JSONBaseProvider
+from web3.providers.async_base import AsyncJSONBaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+logger = logging.getLogger("RPC_Pool")
+
+DEFAULT_BSC_RPC_URLS = [
+    "https://bsc-dataseed.binance.org/",
+    "https://bsc-dataseed1.defibit.io/",
+    "https://bsc-dataseed1.ninicoin.io/",
+]
+
+# JSON-RPC error codes that mean "this endpoint is overloaded", not "bad request"
+RATE_LIMIT_ERROR_CODES = (-32005, -32090)
+
+
+def rpc_urls_from_env(name: str = "BSC_RPC_URLS", fallback: str = "BSC_RPC_URL",
+                      defaults: Optional[List[str]] = None) -> List[str]:
+    """Endpoint list from a comma separated env var, else the single-URL var, else defaults"""
+    urls = [url.strip() for url in os.getenv(name, "").split(",") if url.strip()]
+    if urls:
+        return urls
+    if os.getenv(fallback):
+        return [os.getenv(fallback)]
+    return list(defaults if defaults is not None else DEFAULT_BSC_RPC_URLS)
+
+
+class RpcEndpointError(Exception):
+    """Endpoint-level failure (transport error, 5xx, 429 or rate-limit reply)"""
+
+
+class RpcEndpoint:
+    """One RPC URL with its latency EWMA, error counters and circuit breaker"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, url: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 ewma_alpha: float = 0.2):
+        self.url = url
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.ewma_alpha = ewma_alpha
+        self.latency_ewma: Optional[float] = None
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        """Whether a request may be routed here now; half-open allows one probe"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def release(self, elapsed: Optional[float] = None):
+        """Give back a half-open probe slot without recording an outcome
+
+        A request abandoned after `elapsed` seconds (it lost a hedge race) is
+        folded into the EWMA as a lower bound, so a slow endpoint stops being
+        picked first.
+        """
+        with self._lock:
+            self._probing = False
+            if elapsed is not None and (self.latency_ewma is None or elapsed > self.latency_ewma):
+                self._update_latency(elapsed)
+
+    def _update_latency(self, latency: float):
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma += self.ewma_alpha * (latency - self.latency_ewma)
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self.requests += 1
+            self.consecutive_failures = 0
+            self._probing = False
+            if self.state != self.CLOSED:
+                logger.info(f"✅ RPC endpoint recovered: {self.url}")
+            self.state = self.CLOSED
+            self._update_latency(latency)
+
+    def record_failure(self):
+        with self._lock:
+            self.requests += 1
+            self.errors += 1
+            self.consecutive_failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"⚠️ RPC circuit opened for {self.url}")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "state": self.state,
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 2) if self.latency_ewma is not None else None,
+            "requests": self.requests,
+            "errors": self.errors,
+            "consecutive_failures": self.consecutive_failures
+        }
+
+
+class RpcEndpointPool:
+    """Routes requests to the fastest healthy endpoint"""
+
+    def __init__(self, urls: List[str], failure_threshold: int = 5, reset_timeout: float = 30.0):
+        if not urls:
+            raise ValueError("At least one RPC endpoint is required")
+        self.endpoints = [RpcEndpoint(url, failure_threshold, reset_timeout) for url in urls]
+
+    def ranked(self) -> List[RpcEndpoint]:
+        """Endpoints by latency; unmeasured ones first so every endpoint gets sampled"""
+        return sorted(
+            self.endpoints,
+            key=lambda endpoint: endpoint.latency_ewma if endpoint.latency_ewma is not None else 0.0
+        )
+
+    def candidates(self) -> List[RpcEndpoint]:
+        """Endpoints that may take a request now, fastest first
+
+        Each returned endpoint has been acquired and must see exactly one of
+        record_success, record_failure or release. If every circuit is open,
+        all endpoints are returned anyway rather than failing outright.
+        """
+        ranked = self.ranked()
+        available = [endpoint for endpoint in ranked if endpoint.acquire()]
+        return available or ranked
+
+    @staticmethod
+    def release_all(endpoints: List[RpcEndpoint]):
+        for endpoint in endpoints:
+            endpoint.release()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [endpoint.stats() for endpoint in self.endpoints]
+
+
+def _check_rate_limited(response: RPCResponse):
+    error = response.get("error") if isinstance(response, dict) else None
+    if isinstance(error, dict) and error.get("code") in RATE_LIMIT_ERROR_CODES:
+        raise RpcEndpointError(f"rate limited: {error.get('message')}")
+
+
+class AsyncPooledHTTPProvider(AsyncJSONBaseProvider):
+    """AsyncWeb3 provider spreading requests over several RPC endpoints
+
+    Requests go to the fastest healthy endpoint. If it hasn't answered within
+    a few multiples of its usual latency, the request is hedged to the next
+    endpoint and the first answer wins. Failing endpoints trip a circuit
+    breaker and are skipped until a half-open probe succeeds.
+    """
+
+    def __init__(self, urls: List[str], request_timeout: float = 10.0,
+                 hedge_factor: float = 3.0, hedge_min_delay: float = 0.2,
+                 hedge_max_delay: float = 2.0, failure_threshold: int = 5,
+                 reset_timeout: float = 30.0):
+        super().__init__()
+        self.pool = RpcEndpointPool(urls, failure_threshold, reset_timeout)
+        self.request_timeout = request_timeout
+        self.hedge_factor = hedge_factor
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_delay = hedge_max_delay
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def __str__(self) -> str:
+        return f"RPC pool {[endpoint.url for endpoint in self.pool.endpoints]}"
+
+    def use_session(self, session: aiohttp.ClientSession):
+        self._session = session
+
+    def _hedge_delay(self, endpoint: RpcEndpoint) -> float:
+        if endpoint.latency_ewma is None:
+            return self.hedge_max_delay
+        delay = endpoint.latency_ewma * self.hedge_factor
+        return min(max(delay, self.hedge_min_delay), self.hedge_max_delay)
+
+    async def _send(self, endpoint: RpcEndpoint, request_data: bytes) -> RPCResponse:
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+
+        start = time.perf_counter()
+        try:
+            async with self._session.post(
+                endpoint.url,
+                data=request_data,
+                headers={"Content-Type": "application/json"},
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+            ) as response:
+                if response.status == 429 or response.status >= 500:
+                    raise RpcEndpointError(f"HTTP {response.status}")
+                response.raise_for_status()
+                raw = await response.read()
+            rpc_response = self.decode_rpc_response(raw)
+            _check_rate_limited(rpc_response)
+        except asyncio.CancelledError:
+            endpoint.release(time.perf_counter() - start)
+            raise
+        except Exception:
+            endpoint.record_failure()
+            raise
+
+        endpoint.record_success(time.perf_counter() - start)
+        return rpc_response
+
+    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        request_data = self.encode_rpc_request(method, params)
+        candidates = self.pool.candidates()
+        pending = set()
+        task_endpoints = {}
+        errors = []
+        next_index = 0
+
+        def launch():
+            nonlocal next_index
+            endpoint = candidates[next_index]
+            next_index += 1
+            task = asyncio.ensure_future(self._send(endpoint, request_data))
+            task_endpoints[task] = endpoint
+            pending.add(task)
+            return endpoint
+
+        primary = launch()
+        hedge_delay = self._hedge_delay(primary)
+
+        try:
+            while pending:
+                can_hedge = next_index < len(candidates)
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=hedge_delay if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    # Slow answer - race the next endpoint against it
+                    launch()
+                    continue
+
+                for task in done:
+                    pending.discard(task)
+                    if task.exception() is None:
+                        return task.result()
+                    errors.append(f"{task_endpoints[task].url}: {task.exception()}")
+
+                if not pending and next_index < len(candidates):
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+            # Endpoints that were acquired but never tried give their slot back
+            self.pool.release_all(candidates[next_index:])
+
+        raise ProviderConnectionError(f"All RPC endpoints failed: {'; '.join(errors)}")
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return self.pool.stats()
+
+
+class PooledHTTPProvider(JSONBaseProvider):
+    """Synchronous Web3 provider with the same routing and breakers (failover, no hedging)"""
+
+    def __init__(self, urls: List[str], request_timeout: float = 10.0,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0):
+        super().__init__()
+        self.pool = RpcEndpointPool(urls, failure_threshold, reset_timeout)
+        self.request_timeout = request_timeout
+        self.session = requests.Session()
+
+    def __str__(self) -> str:
+        return f"RPC pool {[endpoint.url for endpoint in self.pool.endpoints]}"
+
+    def _send(self, endpoint: RpcEndpoint, request_data: bytes) -> RPCResponse:
+        start = time.perf_counter()
+        try:
+            response = self.session.post(
+                endpoint.url,
+                data=request_data,
+                headers={"Content-Type": "application/json"},
+                timeout=self.request_timeout
+            )
+            if response.status_code == 429 or response.status_code >= 500:
+                raise RpcEndpointError(f"HTTP {response.status_code}")
+            response.raise_for_status()
+            rpc_response = self.decode_rpc_response(response.content)
+            _check_rate_limited(rpc_response)
+        except Exception:
+            endpoint.record_failure()
+            raise
+
+        endpoint.record_success(time.perf_counter() - start)
+        return rpc_response
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        request_data = self.encode_rpc_request(method, params)
+        candidates = self.pool.candidates()
+        errors = []
+        for index, endpoint in enumerate(candidates):
+            try:
+                response = self._send(endpoint, request_data)
+            except Exception as e:
+                errors.append(f"{endpoint.url}: {e}")
+                continue
+            self.pool.release_all(candidates[index + 1:])
+            return response
+        raise ProviderConnectionError(f"All RPC endpoints failed: {'; '.join(errors)}")
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return self.pool.stats()
@@ -2,18 +2,25 @@ import os
 import logging
 from web3 import Web3
 
+from shared.rpc_pool import PooledHTTPProvider, rpc_urls_from_env
+from shared.token_metadata import token_metadata
+
 # Setup logging
 logger = logging.getLogger("SLH_Web3")
 
 class SLHWeb3:
     def __init__(self):
-        self.bsc_rpc_url = os.getenv("BSC_RPC_URL", "https://bsc-dataseed.binance.org/")
+        # BSC_RPC_URLS - רשימת endpoints מופרדת בפסיקים, עם failover ביניהם
+        self.bsc_rpc_urls = rpc_urls_from_env()
+        self.bsc_rpc_url = self.bsc_rpc_urls[0]
         self.sela_token_address = os.getenv("SELA_TOKEN_ADDRESS", "0xACb0A09414CEA1C879c67bB7A877E4e19480f022")
         
+        self.chain_id = None
         try:
-            self.w3 = Web3(Web3.HTTPProvider(self.bsc_rpc_url))
+            self.w3 = Web3(PooledHTTPProvider(self.bsc_rpc_urls))
             if self.w3.is_connected():
-                logger.info(f"✅ Connected to BSC. Chain ID: {self.w3.eth.chain_id}")
+                self.chain_id = self.w3.eth.chain_id
+                logger.info(f"✅ Connected to BSC. Chain ID: {self.chain_id}")
             else:
                 logger.error("❌ Failed to connect to BSC")
                 self.w3 = None
@@ -63,9 +70,8 @@ class SLHWeb3:
         # אתחול חוזה הטוקן
         if self.w3 and self.sela_token_address:
             try:
-                self.token_contract = self.w3.eth.contract(
-                    address=Web3.to_checksum_address(self.sela_token_address),
-                    abi=self.erc20_abi
+                self.token_contract = token_metadata.contract(
+                    self.w3, self.sela_token_address, self.erc20_abi
                 )
                 logger.info("✅ Token contract initialized successfully")
             except Exception as e:
@@ -74,6 +80,10 @@ class SLHWeb3:
         else:
             self.token_contract = None
     
+    def token_metadata(self):
+        """decimals/symbol/name של הטוקן - נטען פעם אחת ונשמר לדיסק (זורק שגיאה אם ה-RPC לא זמין)"""
+        return token_metadata.load(self.w3, self.chain_id, self.sela_token_address, self.erc20_abi)
+    
     def get_balance(self, address):
         """קבלת יתרת SELA של כתובת"""
         if not self.token_contract:
@@ -83,7 +93,7 @@ class SLHWeb3:
         try:
             checksum_address = Web3.to_checksum_address(address)
             balance = self.token_contract.functions.balanceOf(checksum_address).call()
-            decimals = self.token_contract.functions.decimals().call()
+            decimals = self.token_metadata()["decimals"]
             
             human_balance = balance / (10 ** decimals)
             logger.info(f"Balance for {address}: {human_balance} SELA")
@@ -103,9 +113,10 @@ class SLHWeb3:
             return None
         
         try:
-            symbol = self.token_contract.functions.symbol().call()
-            name = self.token_contract.functions.name().call()
-            decimals = self.token_contract.functions.decimals().call()
+            metadata = self.token_metadata()
+            symbol = metadata["symbol"]
+            name = metadata["name"]
+            decimals = metadata["decimals"]
             total_supply = self.token_contract.functions.totalSupply().call()
             
             return {
@@ -115,7 +126,7 @@ class SLHWeb3:
                 "total_supply": total_supply,
                 "total_supply_human": total_supply / (10 ** decimals),
                 "address": self.sela_token_address,
-                "chain_id": self.w3.eth.chain_id if self.w3 else None
+                "chain_id": self.chain_id
             }
         except Exception as e:
             logger.error(f"Error getting token info: {e}")
@@ -1,16 +1,31 @@
 import os
 import logging
 import json
+import threading
+from concurrent.futures import Future
+from decimal import Decimal
 from web3 import Web3
 import httpx
 from typing import Dict, Any, Optional
 
+from shared.rpc_pool import PooledHTTPProvider, rpc_urls_from_env
+from shared.token_metadata import token_metadata
+from shared.tx_sender import TransactionSender
+
 logger = logging.getLogger("SLH_Web3_Enhanced")
 
+CHAIN_IDS = {"bsc": 56, "eth": 1}
+
+# Worker threads signing and broadcasting transactions per network
+TX_SENDER_WORKERS = int(os.getenv("TX_SENDER_WORKERS", "8"))
+
 class SLHWeb3Enhanced:
     def __init__(self):
-        self.bsc_rpc_url = os.getenv("BSC_RPC_URL", "https://bsc-dataseed.binance.org/")
-        self.eth_rpc_url = os.getenv("ETH_RPC_URL", "https://eth.llamarpc.com")
+        # *_RPC_URLS take a comma separated endpoint list; *_RPC_URL a single one
+        self.bsc_rpc_urls = rpc_urls_from_env()
+        self.eth_rpc_urls = rpc_urls_from_env("ETH_RPC_URLS", "ETH_RPC_URL", ["https://eth.llamarpc.com"])
+        self.bsc_rpc_url = self.bsc_rpc_urls[0]
+        self.eth_rpc_url = self.eth_rpc_urls[0]
         self.sela_token_address = os.getenv("SELA_TOKEN_ADDRESS", "0xACb0A09414CEA1C879c67bB7A877E4e19480f022")
         
         # Initialize Web3 connections
@@ -18,6 +33,9 @@ class SLHWeb3Enhanced:
         self.w3_eth = None
         self.token_contract_bsc = None
         self.token_contract_eth = None
+        self._senders: Dict[str, TransactionSender] = {}
+        self._senders_lock = threading.Lock()
+        self._chain_ids: Dict[str, int] = {}
         
         self._initialize_connections()
         self._initialize_contracts()
@@ -25,7 +43,7 @@ class SLHWeb3Enhanced:
     def _initialize_connections(self):
         """Initialize Web3 connections"""
         try:
-            self.w3_bsc = Web3(Web3.HTTPProvider(self.bsc_rpc_url))
+            self.w3_bsc = Web3(PooledHTTPProvider(self.bsc_rpc_urls))
             if self.w3_bsc.is_connected():
                 logger.info(f"✅ Connected to BSC. Chain ID: {self.w3_bsc.eth.chain_id}")
             else:
@@ -34,7 +52,7 @@ class SLHWeb3Enhanced:
             logger.error(f"❌ BSC Web3 connection error: {e}")
         
         try:
-            self.w3_eth = Web3(Web3.HTTPProvider(self.eth_rpc_url))
+            self.w3_eth = Web3(PooledHTTPProvider(self.eth_rpc_urls))
             if self.w3_eth.is_connected():
                 logger.info(f"✅ Connected to Ethereum. Chain ID: {self.w3_eth.eth.chain_id}")
             else:
@@ -94,9 +112,8 @@ class SLHWeb3Enhanced:
         if self.w3_bsc and self.sela_token_address:
             try:
                 checksum_address = Web3.to_checksum_address(self.sela_token_address)
-                self.token_contract_bsc = self.w3_bsc.eth.contract(
-                    address=checksum_address,
-                    abi=self.erc20_abi
+                self.token_contract_bsc = token_metadata.contract(
+                    self.w3_bsc, checksum_address, self.erc20_abi
                 )
                 logger.info("✅ BSC Token contract initialized")
             except Exception as e:
@@ -106,14 +123,34 @@ class SLHWeb3Enhanced:
         if self.w3_eth and self.sela_token_address:
             try:
                 checksum_address = Web3.to_checksum_address(self.sela_token_address)
-                self.token_contract_eth = self.w3_eth.eth.contract(
-                    address=checksum_address,
-                    abi=self.erc20_abi
+                self.token_contract_eth = token_metadata.contract(
+                    self.w3_eth, checksum_address, self.erc20_abi
                 )
                 logger.info("✅ Ethereum Token contract initialized")
             except Exception as e:
                 logger.error(f"❌ Error initializing Ethereum token contract: {e}")
     
+    def chain_id(self, network: str = "bsc") -> int:
+        """Chain ID reported by the network's node, read once"""
+        chain_id = self._chain_ids.get(network)
+        if chain_id is None:
+            w3 = self.w3_bsc if network == "bsc" else self.w3_eth
+            # Read from the node so a local dev chain (anvil, eth-tester) works too
+            chain_id = w3.eth.chain_id
+            if chain_id != CHAIN_IDS.get(network, chain_id):
+                logger.warning(f"⚠️ {network} RPC reports chain ID {chain_id}")
+            self._chain_ids[network] = chain_id
+        return chain_id
+
+    def token_metadata(self, network: str = "bsc") -> Dict[str, Any]:
+        """Token decimals/symbol/name, loaded once per chain and persisted
+
+        A failed lookup raises; there is no guessed fallback, so balances and
+        transfers are never computed with the wrong decimals.
+        """
+        w3 = self.w3_bsc if network == "bsc" else self.w3_eth
+        return token_metadata.load(w3, self.chain_id(network), self.sela_token_address, self.erc20_abi)
+    
     def get_sela_balance(self, address: str, network: str = "bsc") -> float:
         """Get SELA balance for address"""
         if network == "bsc" and self.token_contract_bsc:
@@ -129,12 +166,7 @@ class SLHWeb3Enhanced:
         try:
             checksum_address = Web3.to_checksum_address(address)
             balance = contract.functions.balanceOf(checksum_address).call()
-            
-            # Try to get decimals, default to 18
-            try:
-                decimals = contract.functions.decimals().call()
-            except:
-                decimals = 18
+            decimals = self.token_metadata(network)["decimals"]
             
             human_balance = balance / (10 ** decimals)
             logger.info(f"✅ SELA balance for {address} on {network}: {human_balance}")
@@ -168,79 +200,86 @@ class SLHWeb3Enhanced:
             return {}
         
         try:
-            symbol = contract.functions.symbol().call()
-            name = contract.functions.name().call()
-            decimals = contract.functions.decimals().call()
+            metadata = self.token_metadata(network)
             
             return {
-                "symbol": symbol,
-                "name": name,
-                "decimals": decimals,
+                "symbol": metadata["symbol"],
+                "name": metadata["name"],
+                "decimals": metadata["decimals"],
                 "address": self.sela_token_address,
                 "network": "BSC" if network == "bsc" else "Ethereum"
             }
         except Exception as e:
             logger.error(f"Error getting token info for {network}: {e}")
-            return {
-                "symbol": "SELA",
-                "name": "SELA Token",
-                "decimals": 18,
-                "address": self.sela_token_address,
-                "network": "BSC" if network == "bsc" else "Ethereum"
-            }
+            return {}
     
     def is_valid_address(self, address: str) -> bool:
         """Validate Ethereum address"""
         return Web3.is_address(address)
     
+    def tx_sender(self, network: str = "bsc") -> Optional[TransactionSender]:
+        """Transaction sender (nonces, fees, receipts) for a network, created on first use"""
+        w3 = self.w3_bsc if network == "bsc" else self.w3_eth
+        if not w3:
+            return None
+        with self._senders_lock:
+            if network not in self._senders:
+                self._senders[network] = TransactionSender(w3, self.chain_id(network), max_workers=TX_SENDER_WORKERS)
+            return self._senders[network]
+
+    def submit_transfer(self, from_address: str, to_address: str, amount: float,
+                        private_key: str, network: str = "bsc") -> Future:
+        """Queue a SELA transfer without waiting for it to be broadcast
+
+        Many transfers from one wallet can be submitted back to back; nonces
+        are assigned locally as they are broadcast. The future resolves to
+        {"tx_hash", "nonce", "from"} once the node accepted the transaction.
+        """
+        contract = self.token_contract_bsc if network == "bsc" else self.token_contract_eth
+        sender = self.tx_sender(network)
+        if not sender or not contract:
+            raise ConnectionError("Network not available")
+
+        if sender.w3.eth.account.from_key(private_key).address != Web3.to_checksum_address(from_address):
+            raise ValueError("Private key does not match from_address")
+
+        decimals = self.token_metadata(network)["decimals"]
+        # Decimal keeps the amount exact; str() gives the shortest repr of a float
+        amount_units = Decimal(str(amount)).scaleb(decimals)
+        if not amount_units.is_finite() or amount_units <= 0 or amount_units != amount_units.to_integral_value():
+            raise ValueError(f"Amount must be positive with at most {decimals} decimal places")
+        amount_wei = int(amount_units)
+        transfer_txn = {
+            "to": contract.address,
+            "data": contract.encodeABI(fn_name="transfer", args=[Web3.to_checksum_address(to_address), amount_wei])
+        }
+        return sender.submit(transfer_txn, private_key)
+
     def transfer_tokens(self, from_address: str, to_address: str, amount: float, 
                        private_key: str, network: str = "bsc") -> Dict[str, Any]:
         """Transfer SELA tokens"""
-        if network == "bsc":
-            w3 = self.w3_bsc
-            contract = self.token_contract_bsc
-            chain_id = 56
-        else:
-            w3 = self.w3_eth
-            contract = self.token_contract_eth
-            chain_id = 1
-        
-        if not w3 or not contract:
-            return {"status": "error", "message": "Network not available"}
-        
         try:
-            # Get decimals
-            try:
-                decimals = contract.functions.decimals().call()
-            except:
-                decimals = 18
-            
-            amount_wei = int(amount * (10 ** decimals))
-            
-            # Build transaction
-            transfer_txn = contract.functions.transfer(
-                Web3.to_checksum_address(to_address),
-                amount_wei
-            ).build_transaction({
-                'chainId': chain_id,
-                'gas': 100000,
-                'gasPrice': w3.to_wei('5', 'gwei'),
-                'nonce': w3.eth.get_transaction_count(Web3.to_checksum_address(from_address)),
-            })
-            
-            # Sign and send
-            signed_txn = w3.eth.account.sign_transaction(transfer_txn, private_key)
-            tx_hash = w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+            sent = self.submit_transfer(from_address, to_address, amount, private_key, network).result()
             
             return {
                 "status": "success",
-                "tx_hash": tx_hash.hex(),
-                "explorer_url": f"https://{'bscscan.com' if network == 'bsc' else 'etherscan.io'}/tx/{tx_hash.hex()}"
+                "tx_hash": sent["tx_hash"],
+                "nonce": sent["nonce"],
+                "explorer_url": f"https://{'bscscan.com' if network == 'bsc' else 'etherscan.io'}/tx/{sent['tx_hash']}"
             }
             
+        except ConnectionError as e:
+            return {"status": "error", "message": str(e)}
         except Exception as e:
             logger.error(f"Transfer error: {e}")
             return {"status": "error", "message": str(e)}
 
+    def transaction_status(self, tx_hash: str, network: str = "bsc") -> Optional[Dict[str, Any]]:
+        """pending / confirmed / failed / dropped for a transaction sent by this process"""
+        sender = self._senders.get(network)
+        if not sender:
+            return None
+        return sender.receipts.status(tx_hash)
+
 # Global instance
 slh_web3_enhanced = SLHWeb3Enhanced()
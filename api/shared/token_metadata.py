@@ -0,0 +1,144 @@
+import os
+import json
+import logging
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from web3 import Web3
+
+logger = logging.getLogger("Token_Metadata")
+
+TOKEN_METADATA_FILE = os.getenv("TOKEN_METADATA_FILE", "data/token_metadata.json")
+
+# decimals/symbol/name never change for a deployed ERC-20
+METADATA_FIELDS = ("decimals", "symbol", "name")
+
+# Seconds to serve defaults after a failed lookup before asking the chain again
+METADATA_RETRY_INTERVAL = 60
+
+
+@lru_cache(maxsize=1024)
+def _checksum(address: str) -> str:
+    return Web3.to_checksum_address(address)
+
+
+class TokenMetadataRegistry:
+    """Immutable token metadata per (chain, token), fetched once and persisted
+
+    Metadata is read from disk on cold start and only fetched from the chain
+    for tokens not seen before. Fallback defaults used while the RPC is down
+    are returned but never persisted, so the next lookup retries. Callers
+    that must not act on a guess (e.g. sending a transfer) pass no defaults
+    and get the lookup error instead.
+    """
+
+    def __init__(self, path: str = TOKEN_METADATA_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._metadata: Dict[str, Dict[str, Any]] = self._read()
+        self._contracts: Dict[tuple, Any] = {}
+        self._failed_at: Dict[str, float] = {}
+
+    @staticmethod
+    def key(chain_id: int, token_address: str) -> str:
+        return f"{chain_id}:{_checksum(token_address)}"
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _store(self, key: str, metadata: Dict[str, Any]):
+        with self._lock:
+            self._metadata[key] = metadata
+            self._failed_at.pop(key, None)
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump(self._metadata, f, indent=2)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                logger.error(f"Error saving token metadata: {e}")
+
+    def get(self, chain_id: int, token_address: str) -> Optional[Dict[str, Any]]:
+        return self._metadata.get(self.key(chain_id, token_address))
+
+    def _recently_failed(self, key: str) -> bool:
+        failed_at = self._failed_at.get(key)
+        return failed_at is not None and time.monotonic() - failed_at < METADATA_RETRY_INTERVAL
+
+    def contract(self, w3, token_address: str, abi: List[dict]):
+        """Pre-built contract instance, one per (web3 instance, token)"""
+        address = _checksum(token_address)
+        cache_key = (id(w3), address)
+        contract = self._contracts.get(cache_key)
+        if contract is None:
+            contract = w3.eth.contract(address=address, abi=abi)
+            # The contract references w3, so id(w3) stays unique while cached
+            self._contracts[cache_key] = contract
+        return contract
+
+    def load(self, w3, chain_id: int, token_address: str, abi: List[dict],
+             defaults: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Metadata for a token via a synchronous Web3, fetching it on first use"""
+        metadata = self.get(chain_id, token_address)
+        if metadata is not None:
+            return metadata
+
+        key = self.key(chain_id, token_address)
+        if defaults is not None and self._recently_failed(key):
+            return dict(defaults)
+
+        contract = self.contract(w3, token_address, abi)
+        fetched = {}
+        try:
+            for field in METADATA_FIELDS:
+                fetched[field] = contract.functions[field]().call()
+        except Exception as e:
+            self._failed_at[key] = time.monotonic()
+            logger.warning(f"Token metadata lookup failed for {token_address} on chain {chain_id}: {e}")
+            if defaults is None:
+                raise
+            return dict(defaults)
+
+        self._store(key, fetched)
+        logger.info(f"✅ Token metadata cached for {token_address} on chain {chain_id}: {fetched}")
+        return fetched
+
+    async def load_async(self, w3, chain_id: int, token_address: str, abi: List[dict],
+                         defaults: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Metadata for a token via an AsyncWeb3, fetching it on first use"""
+        metadata = self.get(chain_id, token_address)
+        if metadata is not None:
+            return metadata
+
+        key = self.key(chain_id, token_address)
+        if defaults is not None and self._recently_failed(key):
+            return dict(defaults)
+
+        contract = self.contract(w3, token_address, abi)
+        fetched = {}
+        try:
+            for field in METADATA_FIELDS:
+                fetched[field] = await contract.functions[field]().call()
+        except Exception as e:
+            self._failed_at[key] = time.monotonic()
+            logger.warning(f"Token metadata lookup failed for {token_address} on chain {chain_id}: {e}")
+            if defaults is None:
+                raise
+            return dict(defaults)
+
+        self._store(key, fetched)
+        logger.info(f"✅ Token metadata cached for {token_address} on chain {chain_id}: {fetched}")
+        return fetched
+
+
+# Global registry shared by the API and the web3 helpers
+token_metadata = TokenMetadataRegistry()
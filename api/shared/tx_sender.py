@@ -0,0 +1,226 @@
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from web3 import Web3
+
+logger = logging.getLogger("TX_Sender")
+
+
+class NonceManager:
+    """Hands out nonces per sender locally instead of asking the node every send
+
+    The first nonce comes from the pending transaction count; after that they
+    are counted in memory, so parallel sends from one hot wallet never
+    collide. reserve() holds the sender's next nonce while its transaction is
+    signed and broadcast, so transactions reach the node in nonce order. If
+    the broadcast fails the nonce is not consumed and the chain is re-read on
+    the next send, which closes any gap left by a transaction the node never
+    kept (or picks up transactions sent from elsewhere).
+    """
+
+    def __init__(self, w3: Web3):
+        self.w3 = w3
+        self._lock = threading.Lock()
+        self._sender_locks: Dict[str, threading.Lock] = {}
+        self._next: Dict[str, int] = {}
+
+    def _sender_lock(self, address: str) -> threading.Lock:
+        with self._lock:
+            return self._sender_locks.setdefault(address, threading.Lock())
+
+    @contextmanager
+    def reserve(self, address: str) -> Iterator[int]:
+        with self._sender_lock(address):
+            nonce = self._next.get(address)
+            if nonce is None:
+                nonce = self.w3.eth.get_transaction_count(address, "pending")
+            try:
+                yield nonce
+            except Exception:
+                self._next.pop(address, None)
+                raise
+            self._next[address] = nonce + 1
+
+    def resync(self, address: str):
+        """Forget the local nonce so the next send re-reads it from the chain"""
+        with self._sender_lock(address):
+            self._next.pop(address, None)
+        logger.info(f"Nonce for {address} will be re-read from the chain")
+
+
+class GasOracle:
+    """Fee parameters cached for roughly a block instead of fetched per transaction
+
+    Uses EIP-1559 fields when the chain reports a base fee, legacy gasPrice
+    otherwise. maxFeePerGas leaves room for the base fee to double.
+    """
+
+    def __init__(self, w3: Web3, ttl: float = 3.0, max_priority_fee: Optional[int] = None):
+        self.w3 = w3
+        self.ttl = ttl
+        self.max_priority_fee = max_priority_fee
+        self._lock = threading.Lock()
+        self._fees: Optional[Dict[str, int]] = None
+        self._fetched_at = 0.0
+
+    def fees(self) -> Dict[str, int]:
+        with self._lock:
+            if self._fees is None or time.monotonic() - self._fetched_at >= self.ttl:
+                self._fees = self._fetch()
+                self._fetched_at = time.monotonic()
+            return dict(self._fees)
+
+    def _fetch(self) -> Dict[str, int]:
+        base_fee = self.w3.eth.get_block("latest").get("baseFeePerGas")
+        if base_fee is None:
+            return {"gasPrice": self.w3.eth.gas_price}
+        priority_fee = self.max_priority_fee
+        if priority_fee is None:
+            priority_fee = self.w3.eth.max_priority_fee
+        return {
+            "maxPriorityFeePerGas": priority_fee,
+            "maxFeePerGas": 2 * base_fee + priority_fee
+        }
+
+
+class ReceiptTracker:
+    """Follows submitted transactions to a receipt on a background thread
+
+    Receipts are polled in one pass per interval for all pending hashes.
+    Transactions without a receipt after `drop_timeout` are reported as
+    dropped and their sender's nonces resynced.
+    """
+
+    def __init__(self, w3: Web3, nonces: NonceManager, poll_interval: float = 3.0,
+                 drop_timeout: float = 600.0, max_finished: int = 10000):
+        self.w3 = w3
+        self.nonces = nonces
+        self.poll_interval = poll_interval
+        self.drop_timeout = drop_timeout
+        self.max_finished = max_finished
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._finished: Dict[str, Dict[str, Any]] = {}
+        self._stop = threading.Event()
+        # Set and cleared only under _lock, so a hash tracked while the poller
+        # is deciding to exit either is seen by it or starts a new one
+        self._running = False
+
+    def track(self, tx_hash: str, sender: str, nonce: int,
+              callback: Optional[Callable[[Dict[str, Any]], None]] = None):
+        with self._lock:
+            self._pending[tx_hash] = {
+                "tx_hash": tx_hash,
+                "from": sender,
+                "nonce": nonce,
+                "status": "pending",
+                "submitted_at": time.monotonic(),
+                "callback": callback
+            }
+            if not self._running:
+                self._running = True
+                self._stop.clear()
+                threading.Thread(target=self._run, name="receipt-tracker", daemon=True).start()
+
+    def status(self, tx_hash: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._pending.get(tx_hash) or self._finished.get(tx_hash)
+            if entry is None:
+                return None
+            return {key: value for key, value in entry.items() if key not in ("callback", "submitted_at")}
+
+    def _run(self):
+        while True:
+            stopped = self._stop.wait(self.poll_interval)
+            with self._lock:
+                pending = list(self._pending.values())
+                if stopped or not pending:
+                    self._running = False
+                    return
+            for entry in pending:
+                try:
+                    self._check(entry)
+                except Exception as e:
+                    logger.warning(f"Receipt lookup failed for {entry['tx_hash']}: {e}")
+
+    def _check(self, entry: Dict[str, Any]):
+        try:
+            receipt = self.w3.eth.get_transaction_receipt(entry["tx_hash"])
+        except Exception as e:
+            if "not found" not in str(e).lower():
+                raise
+            receipt = None
+
+        if receipt is not None:
+            self._finish(entry, "confirmed" if receipt["status"] == 1 else "failed", receipt["blockNumber"])
+        elif time.monotonic() - entry["submitted_at"] > self.drop_timeout:
+            self._finish(entry, "dropped", None)
+            self.nonces.resync(entry["from"])
+
+    def _finish(self, entry: Dict[str, Any], status: str, block_number: Optional[int]):
+        entry.update(status=status, block_number=block_number)
+        with self._lock:
+            self._pending.pop(entry["tx_hash"], None)
+            self._finished[entry["tx_hash"]] = entry
+            while len(self._finished) > self.max_finished:
+                self._finished.pop(next(iter(self._finished)))
+        logger.info(f"Transaction {entry['tx_hash']} {status}")
+        callback = entry.get("callback")
+        if callback is not None:
+            try:
+                callback(self.status(entry["tx_hash"]))
+            except Exception as e:
+                logger.error(f"Receipt callback error: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+
+class TransactionSender:
+    """Pipelined submission of transactions for one chain
+
+    submit() returns a Future right away; gas estimation, fee lookup and
+    signing run on a worker pool, and each sender's transactions are then
+    broadcast back to back in nonce order without waiting for receipts.
+    Gas is estimated per transaction: the same call can cost very different
+    amounts (an ERC-20 transfer to an empty balance pays ~20k more for the
+    new storage slot), and an underestimate reverts but still burns the
+    nonce and fee. Receipts are followed in the background by `receipts`.
+    """
+
+    def __init__(self, w3: Web3, chain_id: int, max_workers: int = 8,
+                 gas_ttl: float = 3.0, gas_limit_margin: float = 1.2):
+        self.w3 = w3
+        self.chain_id = chain_id
+        self.nonces = NonceManager(w3)
+        self.gas = GasOracle(w3, ttl=gas_ttl)
+        self.receipts = ReceiptTracker(w3, self.nonces)
+        self.gas_limit_margin = gas_limit_margin
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tx-sender")
+
+    def submit(self, tx: Dict[str, Any], private_key: str) -> "Future[Dict[str, Any]]":
+        """Queue a transaction dict (to/data/value, without nonce or fees) for sending"""
+        return self._executor.submit(self._send, dict(tx), private_key)
+
+    def _send(self, tx: Dict[str, Any], private_key: str) -> Dict[str, Any]:
+        sender = self.w3.eth.account.from_key(private_key).address
+        tx.update({"from": sender, "chainId": self.chain_id})
+        if "gas" not in tx:
+            tx["gas"] = int(self.w3.eth.estimate_gas(tx) * self.gas_limit_margin)
+        tx.update(self.gas.fees())
+
+        with self.nonces.reserve(sender) as nonce:
+            tx["nonce"] = nonce
+            signed = self.w3.eth.account.sign_transaction(tx, private_key)
+            tx_hash = self.w3.eth.send_raw_transaction(signed.rawTransaction).hex()
+
+        self.receipts.track(tx_hash, sender, nonce)
+        return {"tx_hash": tx_hash, "nonce": nonce, "from": sender}
+
+    def close(self):
+        self.receipts.stop()
+        self._executor.shutdown(wait=True)
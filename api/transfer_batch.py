@@ -0,0 +1,141 @@
+import os
+import math
+import uuid
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from web3 import Web3
+
+# Token symbol -> balance key in the balance dicts returned by get_balances_batch
+TRANSFER_TOKENS = {"SELA": "sela", "BNB": "bnb"}
+
+
+def new_transfer_id() -> str:
+    return f"transfer_{uuid.uuid4().hex}"
+
+
+def new_tx_hash() -> str:
+    # Simulated - in real implementation would come from the blockchain
+    return f"0x{os.urandom(32).hex()}"
+
+
+def is_tx_hash(value: Any) -> bool:
+    if not isinstance(value, str) or len(value) != 66 or not value.startswith("0x"):
+        return False
+    try:
+        int(value[2:], 16)
+    except ValueError:
+        return False
+    return True
+
+
+def transfer_status(tx_hash: Optional[str]) -> str:
+    """A transfer with a client-supplied on-chain hash waits for confirmation"""
+    return "pending" if tx_hash else "completed"
+
+
+def parse_transfer(item: Any) -> Tuple[Optional[dict], Optional[str]]:
+    """Validate one batch item; returns (transfer, None) or (None, error)"""
+    if not isinstance(item, dict):
+        return None, "Transfer must be an object"
+
+    from_address = item.get('from_address')
+    to_address = item.get('to_address')
+    token = str(item.get('token', 'SELA')).upper()
+    try:
+        amount = float(item.get('amount', 0))
+    except (TypeError, ValueError):
+        return None, "Invalid amount"
+
+    if not all([from_address, to_address, amount]):
+        return None, "Missing required fields"
+    # NaN fails every comparison and inf passes the balance checks
+    if not math.isfinite(amount) or amount <= 0:
+        return None, "Amount must be positive"
+    if token not in TRANSFER_TOKENS:
+        return None, f"Unsupported token: {token}"
+    if not Web3.is_address(from_address) or not Web3.is_address(to_address):
+        return None, "Invalid address"
+    tx_hash = item.get('tx_hash')
+    if tx_hash is not None and not is_tx_hash(tx_hash):
+        return None, "Invalid tx_hash"
+
+    return {
+        "from_address": from_address,
+        "to_address": to_address,
+        "sender": Web3.to_checksum_address(from_address),
+        "token": token,
+        "amount": amount,
+        # Lower-cased so the unique tx_hash index sees one spelling per hash
+        "tx_hash": tx_hash.lower() if tx_hash else None
+    }, None
+
+
+def tx_hashes_of(transfers: List[Optional[dict]]) -> Set[str]:
+    return {transfer["tx_hash"] for transfer in transfers if transfer is not None and transfer["tx_hash"]}
+
+
+def senders_of(transfers: List[Optional[dict]]) -> Set[str]:
+    return {transfer["sender"] for transfer in transfers if transfer is not None}
+
+
+def plan_batch(transfers: List[Optional[dict]], errors: List[Optional[str]],
+               balances: Dict[str, Optional[Dict[str, Any]]]) -> Tuple[List[tuple], List[dict]]:
+    """Check funds per sender across the whole batch and build the rows to insert
+
+    Items are taken in order against each sender's running balance per
+    token, so a sender can't overspend by splitting a payout into many
+    transfers. Returns (transfer rows, per-item results in request order).
+    """
+    remaining: Dict[Tuple[str, str], float] = {}
+    tx_hashes: Set[str] = set()
+    rows = []
+    results = []
+
+    for index, (transfer, error) in enumerate(zip(transfers, errors)):
+        if transfer is None:
+            results.append({"index": index, "success": False, "error": error})
+            continue
+
+        sender_balances = balances.get(transfer["sender"])
+        if sender_balances is None:
+            results.append({"index": index, "success": False, "error": "Sender balance unavailable"})
+            continue
+
+        if transfer["tx_hash"] is not None:
+            if transfer["tx_hash"] in tx_hashes:
+                results.append({"index": index, "success": False, "error": "Duplicate tx_hash in batch"})
+                continue
+            tx_hashes.add(transfer["tx_hash"])
+
+        key = (transfer["sender"], transfer["token"])
+        if key not in remaining:
+            remaining[key] = sender_balances[TRANSFER_TOKENS[transfer["token"]]]
+        if remaining[key] < transfer["amount"]:
+            results.append({
+                "index": index,
+                "success": False,
+                "error": f"Insufficient {transfer['token']} balance"
+            })
+            continue
+        remaining[key] -= transfer["amount"]
+
+        transfer_id = new_transfer_id()
+        tx_hash = transfer["tx_hash"] or new_tx_hash()
+        status = transfer_status(transfer["tx_hash"])
+        rows.append((
+            transfer_id, transfer["from_address"], transfer["to_address"],
+            transfer["token"], transfer["amount"], tx_hash, status
+        ))
+        results.append({
+            "index": index,
+            "success": True,
+            "id": transfer_id,
+            "from": transfer["from_address"],
+            "to": transfer["to_address"],
+            "amount": transfer["amount"],
+            "token": transfer["token"],
+            "transaction_hash": tx_hash,
+            "status": status
+        })
+
+    return rows, results
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Per-endpoint timeouts (seconds) by path prefix; balance lookups hit the chain
+ENDPOINT_TIMEOUTS = {
+    "/wallet/balance": 60.0,
+    "/wallet/register": 30.0,
+}
+DEFAULT_TIMEOUT = 10.0
+
+# Retries per endpoint (GET only); POSTs are never retried
+ENDPOINT_RETRIES = {
+    "/wallet/balance": 1,
+}
+DEFAULT_RETRIES = 2
+
+
+class RetryBudget:
+    """Caps retries to a fraction of recent traffic so retries can't amplify an outage"""
+
+    def __init__(self, ratio: float = 0.2, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+
+    def deposit(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class ApiClient:
+    """Long-lived, pooled HTTP client for SELA API calls made by the bot"""
+
+    def __init__(self, base_url: str, max_connections: int = 50,
+                 max_keepalive: int = 20, http2: bool = True):
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.http2 = http2
+        self.retry_budget = RetryBudget()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        if self._client is not None:
+            return
+
+        http2 = self.http2
+        if http2:
+            try:
+                import h2  # noqa: F401 - httpx needs it for HTTP/2
+            except ImportError:
+                logger.warning("h2 not installed, using HTTP/1.1 keep-alive")
+                http2 = False
+
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=http2,
+            timeout=DEFAULT_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+                keepalive_expiry=60.0
+            )
+        )
+        logger.info(f"✅ API client ready for {self.base_url} (http2={http2})")
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def _setting(path: str, settings: Dict[str, Any], default: Any) -> Any:
+        for prefix, value in settings.items():
+            if path.startswith(prefix):
+                return value
+        return default
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        if self._client is None:
+            await self.start()
+
+        timeout = self._setting(path, ENDPOINT_TIMEOUTS, DEFAULT_TIMEOUT)
+        retries = self._setting(path, ENDPOINT_RETRIES, DEFAULT_RETRIES) if method == "GET" else 0
+        self.retry_budget.deposit()
+
+        attempt = 0
+        while True:
+            response = None
+            error = None
+            try:
+                response = await self._client.request(method, path, timeout=timeout, **kwargs)
+                if response.status_code < 500 or attempt >= retries:
+                    return response
+                reason = f"HTTP {response.status_code}"
+            except httpx.TransportError as e:
+                # Timeouts are not retried - the endpoint timeout is the user's wait budget
+                if isinstance(e, httpx.TimeoutException) or attempt >= retries:
+                    raise
+                error = e
+                reason = str(e) or type(e).__name__
+
+            if not self.retry_budget.withdraw():
+                logger.warning(f"Retry budget exhausted for {method} {path} ({reason})")
+                if error is not None:
+                    raise error
+                return response
+
+            attempt += 1
+            logger.info(f"🔁 Retrying {method} {path} ({reason}), attempt {attempt}")
+            await asyncio.sleep(0.1 * attempt)
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
@@ -1,14 +1,44 @@
 import os
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes, MessageHandler, filters
+from telegram.ext import (
+    Application, ApplicationHandlerStop, CommandHandler, CallbackQueryHandler, ContextTypes,
+    MessageHandler, TypeHandler, filters
+)
 import httpx
 from datetime import datetime
+from urllib.parse import urlparse
+
+from api_client import ApiClient
+from response_cache import ResponseCache
+from state_store import create_state_store
+from throttle import RateLimiter, SingleFlight
+from update_processor import ChatOrderedUpdateProcessor
 
 # Configuration
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 API_BASE_URL = os.getenv("API_BASE_URL", "https://slhapi-production.up.railway.app")
 GROUP_LINK = "https://t.me/+HIzvM8sEgh1kNWY0"
+API_MAX_CONNECTIONS = int(os.getenv("API_MAX_CONNECTIONS", "50"))
+API_HTTP2 = os.getenv("API_HTTP2", "true").lower() == "true"
+
+# Webhook mode is used when WEBHOOK_URL is set, otherwise long polling
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+PORT = int(os.getenv("PORT", "8080"))
+MAX_CONCURRENT_UPDATES = int(os.getenv("MAX_CONCURRENT_UPDATES", "32"))
+MAX_PENDING_UPDATES = int(os.getenv("MAX_PENDING_UPDATES", "1024"))
+
+# Read-only API responses shared by all users, kept warm in the background
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+RESPONSE_CACHE_STALE_TTL = float(os.getenv("RESPONSE_CACHE_STALE_TTL", "300"))
+CACHED_API_PATHS = ("/config/price", "/healthz")
+
+# Token buckets: updates per second and burst size, per user and per chat
+USER_RATE_LIMIT = float(os.getenv("USER_RATE_LIMIT", "1"))
+USER_RATE_BURST = float(os.getenv("USER_RATE_BURST", "5"))
+CHAT_RATE_LIMIT = float(os.getenv("CHAT_RATE_LIMIT", "5"))
+CHAT_RATE_BURST = float(os.getenv("CHAT_RATE_BURST", "20"))
 
 # Logging
 logging.basicConfig(
@@ -19,12 +49,44 @@ logger = logging.getLogger(__name__)
 
 class SelaBot:
     def __init__(self):
-        self.application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+        # One pooled client for every API call, opened and closed with the application
+        self.api = ApiClient(API_BASE_URL, max_connections=API_MAX_CONNECTIONS, http2=API_HTTP2)
+        self.responses = ResponseCache(
+            self.api,
+            ttl=RESPONSE_CACHE_TTL,
+            stale_ttl=RESPONSE_CACHE_STALE_TTL,
+            refresh_interval=RESPONSE_CACHE_TTL * 2 / 3
+        )
+        self.application = (
+            Application.builder()
+            .token(TELEGRAM_BOT_TOKEN)
+            .concurrent_updates(ChatOrderedUpdateProcessor(MAX_CONCURRENT_UPDATES, MAX_PENDING_UPDATES))
+            .post_init(self.open_api_client)
+            .post_shutdown(self.close_api_client)
+            .build()
+        )
         self.setup_handlers()
-        self.user_states = {}
+        # Expiring conversation state; STATE_STORE=sqlite shares it across bot replicas
+        self.user_states = create_state_store()
+        self.user_limiter = RateLimiter(USER_RATE_LIMIT, USER_RATE_BURST)
+        self.chat_limiter = RateLimiter(CHAT_RATE_LIMIT, CHAT_RATE_BURST)
+        # Identical balance lookups in flight at the same time share one API call
+        self.balance_lookups = SingleFlight()
+
+    async def open_api_client(self, application: Application):
+        await self.api.start()
+        self.responses.start(CACHED_API_PATHS)
+
+    async def close_api_client(self, application: Application):
+        await self.responses.stop()
+        await self.api.close()
+        await self.user_states.close()
 
     def setup_handlers(self):
         """Setup command handlers"""
+        # Runs before every other handler group and drops updates over the limit
+        self.application.add_handler(TypeHandler(Update, self.rate_limit), group=-1)
+        
         self.application.add_handler(CommandHandler("start", self.start))
         self.application.add_handler(CommandHandler("wallet", self.wallet))
         self.application.add_handler(CommandHandler("price", self.price))
@@ -51,6 +113,25 @@ class SelaBot:
         self.application.add_handler(CallbackQueryHandler(self.button_handler))
         self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
 
+    async def rate_limit(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Per-user and per-chat token bucket in front of all handlers"""
+        allowed, notify = True, False
+        if update.effective_user:
+            allowed, notify = self.user_limiter.check(update.effective_user.id)
+        if allowed and update.effective_chat:
+            allowed, notify = self.chat_limiter.check(update.effective_chat.id)
+        if allowed:
+            return
+        
+        logger.info(f"⏳ Rate limited update from user {getattr(update.effective_user, 'id', None)}")
+        if notify:
+            notice = "⏳ יותר מדי בקשות - נא להמתין מספר שניות ולנסות שוב."
+            if update.callback_query:
+                await update.callback_query.answer(notice)
+            elif update.effective_message:
+                await update.effective_message.reply_text(notice)
+        raise ApplicationHandlerStop
+
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Start command handler"""
         user = update.effective_user
@@ -152,17 +233,19 @@ class SelaBot:
                 await update.edit_message_text(loading_text)
                 loading_msg = None
             
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                logger.info(f"🔍 Fetching blockchain data for: {wallet_address}")
-                response = await client.get(f"{API_BASE_URL}/wallet/balance/{wallet_address}")
+            logger.info(f"🔍 Fetching blockchain data for: {wallet_address}")
+            response = await self.balance_lookups.run(
+                wallet_address.lower(),
+                lambda: self.api.get(f"/wallet/balance/{wallet_address}")
+            )
+            
+            if response.status_code == 200:
+                data = response.json()
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    
-                    # FIXED: Proper address display
-                    display_address = f"{wallet_address[:8]}...{wallet_address[-6:]}"
-                    
-                    message = f"""
+                # FIXED: Proper address display
+                display_address = f"{wallet_address[:8]}...{wallet_address[-6:]}"
+                
+                message = f"""
 👛 **ארנק SELA - BSC**
 
 🌐 **רשת:** {data.get('network', 'BSC (Binance Smart Chain)')}
@@ -177,34 +260,34 @@ class SelaBot:
 ✅ **נתונים אמיתיים:** {data.get('is_real_data', False)}
 🕐 **עדכון:** {datetime.now().strftime('%H:%M:%S')}
                     """
-                    
-                    if loading_msg:
-                        await loading_msg.delete()
-                    
-                    keyboard = [
-                        [InlineKeyboardButton("📤 שלח SELA", callback_data=f"send_sela_{wallet_address}"),
-                         InlineKeyboardButton("📤 שלח BNB", callback_data=f"send_bnb_{wallet_address}")],
-                        [InlineKeyboardButton("📥 קבל", callback_data="receive_tokens"),
-                         InlineKeyboardButton("🔄 מסחר", callback_data="trading_menu")],
-                        [InlineKeyboardButton("🔄 רענן", callback_data=f"refresh_{wallet_address}"),
-                         InlineKeyboardButton("👛 ארנק אחר", callback_data="check_wallet")]
-                    ]
-                    reply_markup = InlineKeyboardMarkup(keyboard)
-                    
-                    if hasattr(update, 'message'):
-                        await update.message.reply_text(message, reply_markup=reply_markup, parse_mode='Markdown')
-                    else:
-                        await update.edit_message_text(message, reply_markup=reply_markup, parse_mode='Markdown')
-                    
+                
+                if loading_msg:
+                    await loading_msg.delete()
+                
+                keyboard = [
+                    [InlineKeyboardButton("📤 שלח SELA", callback_data=f"send_sela_{wallet_address}"),
+                     InlineKeyboardButton("📤 שלח BNB", callback_data=f"send_bnb_{wallet_address}")],
+                    [InlineKeyboardButton("📥 קבל", callback_data="receive_tokens"),
+                     InlineKeyboardButton("🔄 מסחר", callback_data="trading_menu")],
+                    [InlineKeyboardButton("🔄 רענן", callback_data=f"refresh_{wallet_address}"),
+                     InlineKeyboardButton("👛 ארנק אחר", callback_data="check_wallet")]
+                ]
+                reply_markup = InlineKeyboardMarkup(keyboard)
+                
+                if hasattr(update, 'message'):
+                    await update.message.reply_text(message, reply_markup=reply_markup, parse_mode='Markdown')
                 else:
-                    if loading_msg:
-                        await loading_msg.delete()
-                    error_msg = "❌ **שגיאה בקבלת נתונים מהבלוקצ'יין**\n\nלא ניתן להתחבר ל-BSC או הכתובת לא תקינה.\n\n**🌐 ודא שהארנק ברשת BSC**"
-                    if hasattr(update, 'message'):
-                        await update.message.reply_text(error_msg, parse_mode='Markdown')
-                    else:
-                        await update.edit_message_text(error_msg, parse_mode='Markdown')
-                    
+                    await update.edit_message_text(message, reply_markup=reply_markup, parse_mode='Markdown')
+                
+            else:
+                if loading_msg:
+                    await loading_msg.delete()
+                error_msg = "❌ **שגיאה בקבלת נתונים מהבלוקצ'יין**\n\nלא ניתן להתחבר ל-BSC או הכתובת לא תקינה.\n\n**🌐 ודא שהארנק ברשת BSC**"
+                if hasattr(update, 'message'):
+                    await update.message.reply_text(error_msg, parse_mode='Markdown')
+                else:
+                    await update.edit_message_text(error_msg, parse_mode='Markdown')
+                
         except httpx.TimeoutException:
             error_msg = "⏰ **פסק זמן**\n\nהחיבור לבלוקצ'יין ארך יותר מדי זמן. נסה שוב."
             if hasattr(update, 'message'):
@@ -222,13 +305,11 @@ class SelaBot:
     async def price(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Price check command"""
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(f"{API_BASE_URL}/config/price")
+            data = await self.responses.get("/config/price")
+            
+            if data is not None:
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    
-                    message = f"""
+                message = f"""
 📈 **מחירי SELA מעודכנים**
 
 💰 **מחיר SELA:** {data.get('sela_price_ils', 444.50)} ₪
@@ -240,10 +321,10 @@ class SelaBot:
 💡 *מחירים מתעדכנים אוטומטית לפי השוק*
 🕐 *{datetime.now().strftime('%H:%M:%S')}*
                     """
-                    
-                    await update.message.reply_text(message, parse_mode='Markdown')
-                else:
-                    message = """
+                
+                await update.message.reply_text(message, parse_mode='Markdown')
+            else:
+                message = """
 📈 **מחירי SELA - ברירת מחדל**
 
 💰 **מחיר SELA:** 444.50 ₪
@@ -254,8 +335,8 @@ class SelaBot:
 ⛽ **גז:** BNB בלבד
 💡 *המערכת בתהליך עדכון*
                     """
-                    await update.message.reply_text(message, parse_mode='Markdown')
-                    
+                await update.message.reply_text(message, parse_mode='Markdown')
+                
         except Exception as e:
             logger.error(f"Price error: {str(e)}")
             message = """
@@ -274,17 +355,15 @@ class SelaBot:
     async def status(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """System status check - FIXED VERSION"""
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(f"{API_BASE_URL}/healthz")
+            data = await self.responses.get("/healthz")
+            
+            if data is not None:
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    
-                    status_emoji = "🟢" if data.get('status') == 'healthy' else "🔴"
-                    bsc_emoji = "🟢" if data.get('bsc_connected') else "🔴"
-                    token_emoji = "🟢" if data.get('token_connected') else "🔴"
-                    
-                    message = f"""
+                status_emoji = "🟢" if data.get('status') == 'healthy' else "🔴"
+                bsc_emoji = "🟢" if data.get('bsc_connected') else "🔴"
+                token_emoji = "🟢" if data.get('token_connected') else "🔴"
+                
+                message = f"""
 📊 **סטטוס מערכת SELA - BSC**
 
 {status_emoji} **מצב API:** {data.get('status', 'unknown')}
@@ -303,9 +382,9 @@ class SelaBot:
 
 🕐 **עדכון:** {datetime.now().strftime('%H:%M:%S')}
                     """
-                    
-                else:
-                    message = """
+                
+            else:
+                message = """
 📊 **סטטוס מערכת SELA**
 
 🔄 **מצב API:** בתהליך אתחול
@@ -315,7 +394,7 @@ class SelaBot:
 
 **המערכת בעבודה - נסה שוב בעוד דקה**
                     """
-                    
+                
         except Exception as e:
             logger.error(f"Status error: {str(e)}")
             message = """
@@ -378,17 +457,16 @@ class SelaBot:
         user_id = str(update.effective_user.id)
         
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(f"{API_BASE_URL}/wallet/user/{user_id}")
+            response = await self.api.get(f"/wallet/user/{user_id}")
+            
+            if response.status_code == 200:
+                wallet_data = response.json()
                 
-                if response.status_code == 200:
-                    wallet_data = response.json()
-                    
-                    if wallet_data.get('wallet_address'):
-                        wallet_address = wallet_data['wallet_address']
-                        await self.show_wallet_balance(update, wallet_address)
-                    else:
-                        text = """
+                if wallet_data.get('wallet_address'):
+                    wallet_address = wallet_data['wallet_address']
+                    await self.show_wallet_balance(update, wallet_address)
+                else:
+                    text = """
 👛 **עדיין אין לך ארנק רשום**
 
 כדי להשתמש בכל הפיצ'רים, אנא רשום את הארנק שלך:
@@ -401,17 +479,17 @@ class SelaBot:
 **⛽ גז:** BNB בלבד
 **💎 נתונים אמיתיים מהבלוקצ'יין!**
 """
-                        keyboard = [
-                            [InlineKeyboardButton("📝 רישום ארנק", callback_data="register_wallet")],
-                            [InlineKeyboardButton("💰 בדיקת ארנק", callback_data="check_wallet")]
-                        ]
-                        reply_markup = InlineKeyboardMarkup(keyboard)
-                        
-                        await update.message.reply_text(text, reply_markup=reply_markup, parse_mode='Markdown')
-                    
-                else:
-                    await update.message.reply_text("❌ שגיאה בטעינת נתוני הארנק")
+                    keyboard = [
+                        [InlineKeyboardButton("📝 רישום ארנק", callback_data="register_wallet")],
+                        [InlineKeyboardButton("💰 בדיקת ארנק", callback_data="check_wallet")]
+                    ]
+                    reply_markup = InlineKeyboardMarkup(keyboard)
                     
+                    await update.message.reply_text(text, reply_markup=reply_markup, parse_mode='Markdown')
+                
+            else:
+                await update.message.reply_text("❌ שגיאה בטעינת נתוני הארנק")
+                
         except Exception as e:
             logger.error(f"My wallet error: {str(e)}")
             await update.message.reply_text("❌ שגיאה במערכת - נסה שוב מאוחר יותר")
@@ -450,7 +528,7 @@ class SelaBot:
             await update.message.reply_text(help_text, parse_mode='Markdown')
             
             user_id = str(update.effective_user.id)
-            self.user_states[user_id] = 'waiting_for_wallet'
+            await self.user_states.set(user_id, 'waiting_for_wallet')
 
     async def process_wallet_registration(self, update: Update, wallet_address: str):
         """Process wallet registration - FIXED VERSION"""
@@ -462,14 +540,13 @@ class SelaBot:
                 'wallet_address': wallet_address
             }
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                logger.info(f"📝 Registering wallet: {wallet_address} for user: {user_id}")
-                response = await client.post(f"{API_BASE_URL}/wallet/register", json=registration_data)
+            logger.info(f"📝 Registering wallet: {wallet_address} for user: {user_id}")
+            response = await self.api.post("/wallet/register", json=registration_data)
+            
+            if response.status_code == 200:
+                result = response.json()
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    
-                    success_text = f"""
+                success_text = f"""
 ✅ **ארנק BSC נרשם בהצלחה!**
 
 **מספר משתמש:** {user_id}
@@ -491,45 +568,44 @@ class SelaBot:
 
 **👉 השתמש ב /mywallet כדי לראות את הארנק שלך!**
 """
+                
+                keyboard = [
+                    [InlineKeyboardButton("👛 הארנק שלי", callback_data="my_wallet")],
+                    [InlineKeyboardButton("💰 בדיקת יתרות", callback_data=f"check_{wallet_address}")],
+                    [InlineKeyboardButton("🔄 מסחר", callback_data="trading_menu")]
+                ]
+                reply_markup = InlineKeyboardMarkup(keyboard)
+                
+                if hasattr(update, 'message'):
+                    await update.message.reply_text(
+                        success_text,
+                        reply_markup=reply_markup,
+                        parse_mode='Markdown'
+                    )
+                else:
+                    await update.edit_message_text(
+                        success_text,
+                        reply_markup=reply_markup,
+                        parse_mode='Markdown'
+                    )
+                
+                await self.user_states.delete(user_id)
                     
-                    keyboard = [
-                        [InlineKeyboardButton("👛 הארנק שלי", callback_data="my_wallet")],
-                        [InlineKeyboardButton("💰 בדיקת יתרות", callback_data=f"check_{wallet_address}")],
-                        [InlineKeyboardButton("🔄 מסחר", callback_data="trading_menu")]
-                    ]
-                    reply_markup = InlineKeyboardMarkup(keyboard)
-                    
-                    if hasattr(update, 'message'):
-                        await update.message.reply_text(
-                            success_text,
-                            reply_markup=reply_markup,
-                            parse_mode='Markdown'
-                        )
-                    else:
-                        await update.edit_message_text(
-                            success_text,
-                            reply_markup=reply_markup,
-                            parse_mode='Markdown'
-                        )
+            else:
+                error_detail = "שגיאה ברישום הארנק"
+                try:
+                    error_data = response.json()
+                    error_detail = error_data.get('detail', error_detail)
+                except:
+                    pass
                     
-                    if user_id in self.user_states:
-                        del self.user_states[user_id]
-                        
+                logger.error(f"❌ Registration failed: {response.status_code} - {error_detail}")
+                error_msg = f"❌ **{error_detail}**\n\nודא שהכתובת תקינה ונמצאת ברשת BSC."
+                if hasattr(update, 'message'):
+                    await update.message.reply_text(error_msg, parse_mode='Markdown')
                 else:
-                    error_detail = "שגיאה ברישום הארנק"
-                    try:
-                        error_data = response.json()
-                        error_detail = error_data.get('detail', error_detail)
-                    except:
-                        pass
-                        
-                    logger.error(f"❌ Registration failed: {response.status_code} - {error_detail}")
-                    error_msg = f"❌ **{error_detail}**\n\nודא שהכתובת תקינה ונמצאת ברשת BSC."
-                    if hasattr(update, 'message'):
-                        await update.message.reply_text(error_msg, parse_mode='Markdown')
-                    else:
-                        await update.edit_message_text(error_msg, parse_mode='Markdown')
-                
+                    await update.edit_message_text(error_msg, parse_mode='Markdown')
+            
         except Exception as e:
             logger.error(f"Wallet registration error: {str(e)}")
             error_msg = "❌ **שגיאה במערכת** - נסה שוב מאוחר יותר"
@@ -580,15 +656,14 @@ class SelaBot:
         user_id = str(update.effective_user.id)
         
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(f"{API_BASE_URL}/wallet/user/{user_id}")
+            response = await self.api.get(f"/wallet/user/{user_id}")
+            
+            if response.status_code == 200:
+                wallet_data = response.json()
+                wallet_address = wallet_data.get('wallet_address')
                 
-                if response.status_code == 200:
-                    wallet_data = response.json()
-                    wallet_address = wallet_data.get('wallet_address')
-                    
-                    if wallet_address:
-                        receive_text = f"""
+                if wallet_address:
+                    receive_text = f"""
 📥 **קבלת Tokens - BSC**
 
 **כתובת הארנק שלך:**
@@ -614,8 +689,8 @@ class SelaBot:
 שלח רק מ-BSC ל-BSC!
 אל תשלח מרשת אחרת!
 """
-                    else:
-                        receive_text = """
+                else:
+                    receive_text = """
 📥 **קבלת Tokens**
 
 עדיין אין לך ארנק רשום.
@@ -630,23 +705,23 @@ class SelaBot:
 
 **👉 התחל עם:** /register
 """
-                    
-                    keyboard = [
-                        [InlineKeyboardButton("👛 הארנק שלי", callback_data="my_wallet")],
-                        [InlineKeyboardButton("📝 רישום ארנק", callback_data="register_wallet")],
-                        [InlineKeyboardButton("📤 שלח", callback_data="send_tokens")]
-                    ]
-                    reply_markup = InlineKeyboardMarkup(keyboard)
-                    
-                    await update.message.reply_text(
-                        receive_text,
-                        reply_markup=reply_markup,
-                        parse_mode='Markdown'
-                    )
-                    
-                else:
-                    await update.message.reply_text("❌ שגיאה בטעינת נתוני הארנק")
-                    
+                
+                keyboard = [
+                    [InlineKeyboardButton("👛 הארנק שלי", callback_data="my_wallet")],
+                    [InlineKeyboardButton("📝 רישום ארנק", callback_data="register_wallet")],
+                    [InlineKeyboardButton("📤 שלח", callback_data="send_tokens")]
+                ]
+                reply_markup = InlineKeyboardMarkup(keyboard)
+                
+                await update.message.reply_text(
+                    receive_text,
+                    reply_markup=reply_markup,
+                    parse_mode='Markdown'
+                )
+                
+            else:
+                await update.message.reply_text("❌ שגיאה בטעינת נתוני הארנק")
+                
         except Exception as e:
             logger.error(f"Receive tokens error: {str(e)}")
             await update.message.reply_text("❌ שגיאה במערכת")
@@ -732,7 +807,7 @@ class SelaBot:
         text = update.message.text
         user_id = str(update.effective_user.id)
         
-        if user_id in self.user_states and self.user_states[user_id] == 'waiting_for_wallet':
+        if await self.user_states.get(user_id) == 'waiting_for_wallet':
             if text.startswith('0x') and len(text) == 42:
                 await self.process_wallet_registration(update, text)
                 return
@@ -779,7 +854,19 @@ class SelaBot:
     def run(self):
         """Run the bot"""
         logger.info("🚀 Starting SELA Trading Bot with BSC Blockchain Data...")
-        self.application.run_polling()
+        if WEBHOOK_URL:
+            logger.info(f"🌐 Webhook mode on port {PORT}: {WEBHOOK_URL}")
+            self.application.run_webhook(
+                listen="0.0.0.0",
+                port=PORT,
+                url_path=urlparse(WEBHOOK_URL).path.lstrip("/"),
+                webhook_url=WEBHOOK_URL,
+                secret_token=WEBHOOK_SECRET,
+                max_connections=MAX_CONCURRENT_UPDATES,
+                allowed_updates=Update.ALL_TYPES
+            )
+        else:
+            self.application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 if __name__ == "__main__":
     if not TELEGRAM_BOT_TOKEN:
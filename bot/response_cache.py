@@ -0,0 +1,110 @@
+import time
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from api_client import ApiClient
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """In-memory cache of read-only API responses with stale-while-revalidate
+
+    Fresh entries (younger than `ttl`) are served directly. Stale entries
+    (up to `ttl + stale_ttl` old) are served immediately while one background
+    request refreshes them. Only missing or expired entries make the caller
+    wait, and concurrent misses share a single request. Paths passed to
+    start() are refreshed on a timer so they never go stale while the bot runs.
+    """
+
+    def __init__(self, api: ApiClient, ttl: float = 30.0, stale_ttl: float = 300.0,
+                 refresh_interval: float = 20.0):
+        self.api = api
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.refresh_interval = refresh_interval
+        self._entries: Dict[str, Tuple[float, Any]] = {}  # path -> (fetched_at, json)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._hot_paths: Tuple[str, ...] = ()
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    async def get(self, path: str) -> Optional[Any]:
+        """JSON body of a successful GET, or None if the API can't answer and nothing is cached"""
+        entry = self._entries.get(path)
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age < self.ttl:
+                self.hits += 1
+                return entry[1]
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._refresh(path)
+                return entry[1]
+
+        self.misses += 1
+        try:
+            # Shield so one cancelled caller doesn't cancel the fetch for the others
+            return await asyncio.shield(self._refresh(path))
+        except Exception as e:
+            logger.warning(f"API request for {path} failed: {str(e)}")
+            return None
+
+    def _refresh(self, path: str) -> asyncio.Future:
+        future = self._inflight.get(path)
+        if future is None:
+            future = asyncio.ensure_future(self._load(path))
+            # Background refreshes may have no awaiter; don't warn about their errors
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._inflight[path] = future
+        return future
+
+    async def _load(self, path: str) -> Any:
+        try:
+            response = await self.api.get(path)
+            response.raise_for_status()
+            data = response.json()
+            self._entries[path] = (time.monotonic(), data)
+            return data
+        finally:
+            self._inflight.pop(path, None)
+
+    async def _run(self):
+        while True:
+            for path in self._hot_paths:
+                try:
+                    await self._refresh(path)
+                except Exception as e:
+                    logger.warning(f"Background refresh of {path} failed: {str(e)}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self, hot_paths: Iterable[str] = ()):
+        self._hot_paths = tuple(hot_paths)
+        if self._hot_paths and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def invalidate(self, path: str):
+        self._entries.pop(path, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl
+        }
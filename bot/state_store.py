@@ -0,0 +1,136 @@
+import os
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+STATE_STORE = os.getenv("STATE_STORE", "memory")
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", "data/bot_state.db")
+STATE_TTL = float(os.getenv("STATE_TTL", "900"))
+STATE_MAX_ENTRIES = int(os.getenv("STATE_MAX_ENTRIES", "100000"))
+
+
+class StateStore(ABC):
+    """Conversation state per Telegram user (e.g. 'waiting_for_wallet') with expiry"""
+
+    @abstractmethod
+    async def get(self, user_id: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    async def set(self, user_id: str, state: str, ttl: Optional[float] = None):
+        ...
+
+    @abstractmethod
+    async def delete(self, user_id: str):
+        ...
+
+    async def close(self):
+        pass
+
+
+class MemoryStateStore(StateStore):
+    """Process-local store, bounded by LRU eviction and per-entry TTL"""
+
+    def __init__(self, ttl: float = STATE_TTL, max_entries: int = STATE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # user_id -> (expires_at, state)
+
+    async def get(self, user_id: str) -> Optional[str]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[user_id]
+            return None
+        return entry[1]
+
+    async def set(self, user_id: str, state: str, ttl: Optional[float] = None):
+        self._entries[user_id] = (time.monotonic() + (ttl or self.ttl), state)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, user_id: str):
+        self._entries.pop(user_id, None)
+
+
+class SQLiteStateStore(StateStore):
+    """Store in a shared SQLite file so several bot processes see the same flows
+
+    Expired rows are ignored on read and purged periodically on write.
+    """
+
+    PURGE_EVERY = 500
+
+    def __init__(self, path: str = STATE_DB_PATH, ttl: float = STATE_TTL):
+        self.path = path
+        self.ttl = ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS conversation_state (
+                user_id TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_conversation_state_expires ON conversation_state(expires_at)"
+        )
+        self._writes = 0
+        logger.info(f"✅ Conversation state stored in {path}")
+
+    def _execute(self, sql: str, params: tuple = ()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    async def get(self, user_id: str) -> Optional[str]:
+        row = await asyncio.to_thread(
+            self._execute,
+            "SELECT state FROM conversation_state WHERE user_id = ? AND expires_at > ?",
+            (user_id, time.time())
+        )
+        return row[0] if row else None
+
+    async def set(self, user_id: str, state: str, ttl: Optional[float] = None):
+        await asyncio.to_thread(
+            self._execute,
+            "INSERT OR REPLACE INTO conversation_state (user_id, state, expires_at) VALUES (?, ?, ?)",
+            (user_id, state, time.time() + (ttl or self.ttl))
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            await asyncio.to_thread(
+                self._execute, "DELETE FROM conversation_state WHERE expires_at <= ?", (time.time(),)
+            )
+
+    async def delete(self, user_id: str):
+        await asyncio.to_thread(
+            self._execute, "DELETE FROM conversation_state WHERE user_id = ?", (user_id,)
+        )
+
+    async def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_state_store() -> StateStore:
+    """Store selected by STATE_STORE: 'memory' (default) or 'sqlite'"""
+    if STATE_STORE == "sqlite":
+        return SQLiteStateStore(STATE_DB_PATH, STATE_TTL)
+    if STATE_STORE != "memory":
+        logger.warning(f"Unknown STATE_STORE '{STATE_STORE}', using memory")
+    return MemoryStateStore(STATE_TTL, STATE_MAX_ENTRIES)
@@ -0,0 +1,75 @@
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class TokenBucket:
+    """Allows `rate` actions per second with bursts of up to `burst`"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated", "throttled")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.throttled = False
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            self.throttled = False
+            return True
+        return False
+
+
+class RateLimiter:
+    """Token bucket per key (user or chat id), bounded by LRU eviction
+
+    An evicted key simply starts again with a full bucket.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+
+    def check(self, key: Hashable) -> Tuple[bool, bool]:
+        """(allowed, first_rejection) - the second flag lets callers warn only once per burst"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+
+        if bucket.take():
+            return True, False
+        first_rejection = not bucket.throttled
+        bucket.throttled = True
+        return False, first_rejection
+
+
+class SingleFlight:
+    """Collapses concurrent identical calls into one; later callers share its result"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one cancelled caller doesn't cancel the call for the others
+        return await asyncio.shield(future)
+
+    def __len__(self) -> int:
+        return len(self._inflight)
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, Hashable, List, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Processes updates concurrently while keeping each chat's updates in order
+
+    Updates from different chats run in parallel on at most `max_workers`
+    handlers at once; updates from the same chat run one after another in
+    arrival order. A chat waiting on its own earlier update does not hold a
+    worker slot, so one slow chat can't starve the others. `max_pending`
+    bounds queued plus running updates so a flood applies backpressure.
+    """
+
+    def __init__(self, max_workers: int = 32, max_pending: int = 1024):
+        super().__init__(max(max_pending, max_workers))
+        self.max_workers = max_workers
+        self._workers = asyncio.BoundedSemaphore(max_workers)
+        # chat key -> [lock, number of updates holding or waiting for it]
+        self._chat_locks: Dict[Hashable, List[Any]] = {}
+
+    @staticmethod
+    def ordering_key(update: object) -> Optional[Hashable]:
+        """Chat id (or user id for chat-less updates); None means no ordering needed"""
+        if not isinstance(update, Update):
+            return None
+        if update.effective_chat is not None:
+            return ("chat", update.effective_chat.id)
+        if update.effective_user is not None:
+            return ("user", update.effective_user.id)
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self.ordering_key(update)
+        if key is None:
+            async with self._workers:
+                await coroutine
+            return
+
+        entry = self._chat_locks.get(key)
+        if entry is None:
+            entry = self._chat_locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            # asyncio.Lock wakes waiters FIFO, which preserves arrival order per chat
+            async with entry[0]:
+                async with self._workers:
+                    await coroutine
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._chat_locks.pop(key, None)
+
+    async def initialize(self) -> None:
+        logger.info(f"✅ Update processor ready ({self.max_workers} workers)")
+
+    async def shutdown(self) -> None:
+        self._chat_locks.clear()
@@ -1,14 +1,24 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 import uvicorn
 import asyncio
 import logging
 from datetime import datetime
 
+from matching_engine import SUBSCRIBER_DROPPED, MatchingEngine
+
 app = FastAPI(title="SELA Exchange Engine")
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+engine = MatchingEngine()
+
+# Largest number of price levels per side /orderbook returns
+MAX_ORDERBOOK_DEPTH = 500
+
+# Websocket close code sent to trade subscribers dropped for reading too slowly
+WS_POLICY_VIOLATION = 1008
+
 @app.get("/")
 async def root():
     return {
@@ -21,5 +31,99 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "exchange-engine"}
 
+@app.post("/order")
+async def submit_order(order_data: dict):
+    """Submit a limit order to the matching engine"""
+    user_id = order_data.get('user_id')
+    pair = order_data.get('pair', 'SELA_BNB')
+    side = order_data.get('side', 'buy')
+
+    try:
+        price = float(order_data.get('price', 0.0))
+        amount = float(order_data.get('amount', 0.0))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid order data")
+
+    if not user_id:
+        raise HTTPException(status_code=400, detail="Missing user_id")
+
+    try:
+        order, trades = engine.submit_order(
+            user_id, pair, side, price, amount, order_id=order_data.get('order_id')
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "success": True,
+        "order": order.to_dict(),
+        "trades": trades,
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.post("/order/cancel")
+async def cancel_order(cancel_data: dict):
+    """Cancel a resting order"""
+    order_id = cancel_data.get('order_id')
+    user_id = cancel_data.get('user_id')
+
+    if not order_id or not user_id:
+        raise HTTPException(status_code=400, detail="Missing order_id or user_id")
+
+    order = engine.cancel_order(order_id, user_id)
+    if order is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    return {"success": True, "order": order.to_dict()}
+
+@app.get("/order/{order_id}")
+async def get_order(order_id: str):
+    """Get a resting order"""
+    order = engine.get_order(order_id)
+    if order is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return order.to_dict()
+
+@app.get("/orderbook/{pair}")
+async def get_orderbook(pair: str, depth: int = 20):
+    """Get aggregated depth for a trading pair"""
+    if depth < 1 or depth > MAX_ORDERBOOK_DEPTH:
+        raise HTTPException(status_code=400, detail=f"depth must be between 1 and {MAX_ORDERBOOK_DEPTH}")
+    book = engine.books.get(pair)
+    levels = book.depth(depth) if book else {"bids": [], "asks": []}
+    return {
+        "pair": pair,
+        "bids": levels["bids"],
+        "asks": levels["asks"],
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/trades/{pair}")
+async def get_trades(pair: str, limit: int = 50):
+    """Get most recent trades for a trading pair"""
+    return {
+        "pair": pair,
+        "trades": engine.recent_trades(pair, limit),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.websocket("/ws/trades")
+async def trades_stream(websocket: WebSocket):
+    """Stream trades as they are executed"""
+    await websocket.accept()
+    queue = engine.subscribe()
+    try:
+        while True:
+            trade = await queue.get()
+            if trade is SUBSCRIBER_DROPPED:
+                # Fell too far behind; closing tells the client to reconnect
+                await websocket.close(code=WS_POLICY_VIOLATION, reason="Too slow, trades dropped")
+                break
+            await websocket.send_json(trade)
+    except (WebSocketDisconnect, asyncio.CancelledError):
+        pass
+    finally:
+        engine.unsubscribe(queue)
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8001)
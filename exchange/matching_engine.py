@@ -0,0 +1,301 @@
+import asyncio
+import itertools
+import logging
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Remaining amounts below this are treated as fully filled (float rounding)
+EPSILON = 1e-12
+
+BUY = "buy"
+SELL = "sell"
+
+# Last item a dropped trade subscriber receives from its queue
+SUBSCRIBER_DROPPED = None
+
+
+def maker_side(taker_side: str) -> str:
+    return SELL if taker_side == BUY else BUY
+
+
+class Order:
+    """A resting or incoming limit order"""
+
+    __slots__ = ("id", "user_id", "pair", "side", "price", "amount", "filled",
+                 "status", "created_at")
+
+    def __init__(self, order_id: str, user_id: str, pair: str, side: str,
+                 price: float, amount: float):
+        self.id = order_id
+        self.user_id = user_id
+        self.pair = pair
+        self.side = side
+        self.price = price
+        self.amount = amount
+        self.filled = 0.0
+        self.status = "open"
+        self.created_at = time.time()
+
+    @property
+    def remaining(self) -> float:
+        return self.amount - self.filled
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "pair": self.pair,
+            "side": self.side,
+            "price": self.price,
+            "amount": self.amount,
+            "filled": self.filled,
+            "status": self.status,
+            "created_at": self.created_at
+        }
+
+
+class PriceLevel:
+    """FIFO queue of orders resting at one price"""
+
+    __slots__ = ("price", "orders", "volume")
+
+    def __init__(self, price: float):
+        self.price = price
+        self.orders = deque()
+        self.volume = 0.0
+
+    def append(self, order: Order):
+        self.orders.append(order)
+        self.volume += order.remaining
+
+    def head(self) -> Optional[Order]:
+        # Cancelled orders are removed lazily so cancels stay O(1)
+        orders = self.orders
+        while orders and orders[0].status not in ("open", "partial"):
+            orders.popleft()
+        return orders[0] if orders else None
+
+
+class OrderBook:
+    """Bid/ask book for a single pair with price-time priority"""
+
+    def __init__(self, pair: str):
+        self.pair = pair
+        self.bids: Dict[float, PriceLevel] = {}
+        self.asks: Dict[float, PriceLevel] = {}
+        # Sorted ascending; best bid is the last element, best ask the first
+        self.bid_prices: List[float] = []
+        self.ask_prices: List[float] = []
+        self.orders: Dict[str, Order] = {}
+
+    def best_bid(self) -> Optional[float]:
+        return self.bid_prices[-1] if self.bid_prices else None
+
+    def best_ask(self) -> Optional[float]:
+        return self.ask_prices[0] if self.ask_prices else None
+
+    def _side(self, side: str) -> Tuple[Dict[float, PriceLevel], List[float]]:
+        if side == BUY:
+            return self.bids, self.bid_prices
+        return self.asks, self.ask_prices
+
+    def _rest(self, order: Order):
+        levels, prices = self._side(order.side)
+        level = levels.get(order.price)
+        if level is None:
+            level = PriceLevel(order.price)
+            levels[order.price] = level
+            prices.insert(bisect_left(prices, order.price), order.price)
+        level.append(order)
+        self.orders[order.id] = order
+
+    def _remove_level(self, side: str, price: float):
+        levels, prices = self._side(side)
+        del levels[price]
+        index = bisect_left(prices, price)
+        if index < len(prices) and prices[index] == price:
+            del prices[index]
+
+    def match(self, taker: Order, trade_ids) -> List[Dict[str, Any]]:
+        """Match an incoming order against the opposite side, resting any remainder"""
+        trades = []
+        if taker.side == BUY:
+            levels, prices = self.asks, self.ask_prices
+        else:
+            levels, prices = self.bids, self.bid_prices
+
+        while taker.remaining > EPSILON and prices:
+            best = prices[0] if taker.side == BUY else prices[-1]
+            if taker.side == BUY and best > taker.price:
+                break
+            if taker.side == SELL and best < taker.price:
+                break
+
+            level = levels[best]
+            while taker.remaining > EPSILON:
+                maker = level.head()
+                if maker is None:
+                    break
+
+                quantity = min(taker.remaining, maker.remaining)
+                maker.filled += quantity
+                taker.filled += quantity
+                level.volume -= quantity
+
+                if maker.remaining <= EPSILON:
+                    maker.status = "filled"
+                    level.orders.popleft()
+                    del self.orders[maker.id]
+                else:
+                    maker.status = "partial"
+
+                trades.append({
+                    "id": f"trade_{next(trade_ids)}",
+                    "pair": self.pair,
+                    "price": best,
+                    "amount": quantity,
+                    "taker_side": taker.side,
+                    "maker_order_id": maker.id,
+                    "taker_order_id": taker.id,
+                    "buyer": taker.user_id if taker.side == BUY else maker.user_id,
+                    "seller": maker.user_id if taker.side == BUY else taker.user_id,
+                    "timestamp": time.time()
+                })
+
+            if level.head() is None:
+                self._remove_level(maker_side(taker.side), best)
+
+        if taker.remaining <= EPSILON:
+            taker.status = "filled"
+        else:
+            if taker.filled > 0:
+                taker.status = "partial"
+            self._rest(taker)
+
+        return trades
+
+    def cancel(self, order_id: str) -> Optional[Order]:
+        order = self.orders.pop(order_id, None)
+        if order is None:
+            return None
+
+        levels, _ = self._side(order.side)
+        level = levels[order.price]
+        level.volume -= order.remaining
+        order.status = "cancelled"
+        if level.head() is None:
+            self._remove_level(order.side, order.price)
+        return order
+
+    def depth(self, limit: int = 20) -> Dict[str, List[Dict[str, Any]]]:
+        """Aggregated price levels, best first"""
+        if limit <= 0:
+            return {"bids": [], "asks": []}
+        bids = [
+            {"price": price, "amount": self.bids[price].volume}
+            for price in reversed(self.bid_prices[-limit:])
+        ]
+        asks = [
+            {"price": price, "amount": self.asks[price].volume}
+            for price in self.ask_prices[:limit]
+        ]
+        return {"bids": bids, "asks": asks}
+
+
+class MatchingEngine:
+    """Per-pair order books plus a trade stream"""
+
+    def __init__(self, trade_history: int = 1000, subscriber_queue_size: int = 1000):
+        self.books: Dict[str, OrderBook] = {}
+        self.trades: Dict[str, deque] = {}
+        self.order_pairs: Dict[str, str] = {}
+        self.subscribers: List[asyncio.Queue] = []
+        self.trade_history = trade_history
+        self.subscriber_queue_size = subscriber_queue_size
+        self._order_ids = itertools.count(1)
+        self._trade_ids = itertools.count(1)
+
+    def book(self, pair: str) -> OrderBook:
+        book = self.books.get(pair)
+        if book is None:
+            book = OrderBook(pair)
+            self.books[pair] = book
+            self.trades[pair] = deque(maxlen=self.trade_history)
+        return book
+
+    def submit_order(self, user_id: str, pair: str, side: str, price: float,
+                     amount: float, order_id: Optional[str] = None) -> Tuple[Order, List[Dict[str, Any]]]:
+        """Submit a limit order and return it together with the trades it produced"""
+        if side not in (BUY, SELL):
+            raise ValueError(f"Invalid side: {side}")
+        if price <= 0 or amount <= 0:
+            raise ValueError("Price and amount must be positive")
+
+        if order_id is None:
+            order_id = f"order_{next(self._order_ids)}"
+        elif order_id in self.order_pairs:
+            raise ValueError(f"Duplicate order id: {order_id}")
+
+        order = Order(order_id, user_id, pair, side, price, amount)
+        trades = self.book(pair).match(order, self._trade_ids)
+        if order.status in ("open", "partial"):
+            self.order_pairs[order.id] = pair
+
+        resting = self.books[pair].orders
+        for trade in trades:
+            if trade["maker_order_id"] not in resting:
+                self.order_pairs.pop(trade["maker_order_id"], None)
+            self.trades[pair].append(trade)
+            self._publish(trade)
+
+        return order, trades
+
+    def cancel_order(self, order_id: str, user_id: Optional[str] = None) -> Optional[Order]:
+        pair = self.order_pairs.get(order_id)
+        if pair is None:
+            return None
+
+        book = self.books[pair]
+        order = book.orders.get(order_id)
+        if order is None or (user_id is not None and order.user_id != user_id):
+            return None
+
+        del self.order_pairs[order_id]
+        return book.cancel(order_id)
+
+    def get_order(self, order_id: str) -> Optional[Order]:
+        pair = self.order_pairs.get(order_id)
+        if pair is None:
+            return None
+        return self.books[pair].orders.get(order_id)
+
+    def recent_trades(self, pair: str, limit: int = 50) -> List[Dict[str, Any]]:
+        trades = self.trades.get(pair)
+        if not trades:
+            return []
+        return list(itertools.islice(reversed(trades), limit))
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.subscriber_queue_size)
+        self.subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        if queue in self.subscribers:
+            self.subscribers.remove(queue)
+
+    def _publish(self, trade: Dict[str, Any]):
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(trade)
+            except asyncio.QueueFull:
+                # Slow consumers are dropped rather than stalling the engine; the
+                # oldest trade makes room for the sentinel that tells them so
+                logger.warning("Trade subscriber queue full, dropping subscriber")
+                self.unsubscribe(queue)
+                queue.get_nowait()
+                queue.put_nowait(SUBSCRIBER_DROPPED)
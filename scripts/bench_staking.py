@@ -0,0 +1,88 @@
+"""Concurrent stake/claim benchmark for the staking ledger
+
+Runs several processes, each with several threads, against one temporary
+staking journal and checks afterwards that no update was lost:
+
+    python scripts/bench_staking.py --processes 4 --threads 8 --ops 2000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+STAKING_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "staking")
+
+
+def load_staking(staking_file: str):
+    os.environ["STAKING_FILE"] = staking_file
+    os.environ["STAKING_REWARDS_DB"] = os.path.join(os.path.dirname(staking_file), "staking_rewards.db")
+    sys.path.insert(0, STAKING_DIR)
+    import main
+    return main.staking_system
+
+
+def worker(staking_file: str, threads: int, ops: int, users: int, seed: int) -> int:
+    staking = load_staking(staking_file)
+
+    def run(thread_index: int) -> int:
+        rng = random.Random(seed * 1000 + thread_index)
+        staked = 0
+        for _ in range(ops):
+            user_id = str(rng.randrange(users))
+            if rng.random() < 0.8:
+                staking.stake_tokens(user_id, 1)
+                staked += 1
+            else:
+                staking.claim_rewards(user_id)
+        return staked
+
+    with ThreadPoolExecutor(threads) as pool:
+        staked = sum(pool.map(run, range(threads)))
+    staking.journal.close()
+    return staked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=2000, help="operations per thread")
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+
+    staking_file = os.path.join(tempfile.mkdtemp(prefix="staking-bench-"), "staking.json")
+    # spawn, not fork: each process must open its own journal handle for flock to work
+    ctx = multiprocessing.get_context("spawn")
+
+    start = time.perf_counter()
+    with ctx.Pool(args.processes) as pool:
+        staked = sum(pool.starmap(
+            worker,
+            [(staking_file, args.threads, args.ops, args.users, seed) for seed in range(args.processes)]
+        ))
+    elapsed = time.perf_counter() - start
+
+    staking = load_staking(staking_file)
+    total_ops = args.processes * args.threads * args.ops
+    pool_total = staking.get_pool_info()["total_staked"]
+    user_total = sum(
+        position["staked_amount"]
+        for positions in staking.data["users"].values()
+        for position in positions.values()
+    )
+
+    print(f"{total_ops} ops in {elapsed:.2f}s = {total_ops / elapsed:,.0f} ops/s "
+          f"({args.processes} processes x {args.threads} threads)")
+    print(f"expected staked {staked}, pool total {pool_total}, sum of users {user_total}")
+    if not staked == pool_total == user_total:
+        print("❌ Lost updates detected")
+        sys.exit(1)
+    print("✅ Totals consistent")
+
+
+if __name__ == "__main__":
+    main()
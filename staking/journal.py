@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import fcntl
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StakingJournal:
+    """Append-only operation log with periodic snapshots for the staking state
+
+    Every state change is appended to the journal as one JSON line and only
+    compacted into the snapshot every `snapshot_every` operations, so a write
+    costs O(1) instead of rewriting the whole state. On startup the snapshot
+    is loaded and newer journal records are replayed.
+
+    Several processes may share the same files. Writers hold an exclusive
+    flock on the journal and first replay records appended by other processes
+    (catch_up), so each process applies every operation exactly once and in
+    the same order. Readers take a shared lock for the catch-up.
+
+    Durability: each record is written to the OS immediately, so a process
+    crash loses nothing; fsync is batched to at most once per `fsync_interval`
+    seconds, so a power loss can lose at most that window. Snapshots are
+    written to a temp file, fsynced and atomically renamed into place.
+    """
+
+    def __init__(self, snapshot_path: str, journal_path: Optional[str] = None,
+                 snapshot_every: int = 1000, fsync_interval: float = 0.05):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or f"{os.path.splitext(snapshot_path)[0]}.journal"
+        self.snapshot_every = snapshot_every
+        self.fsync_interval = fsync_interval
+        self.seq = 0
+        self._offset = 0
+        self._snapshot_id = None
+        self._since_snapshot = 0
+        self._last_fsync = 0.0
+        self._dirty = False
+        self._apply: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None
+        self._default: Optional[Callable[[], Dict[str, Any]]] = None
+        self._upgrade: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None
+        self._file = None
+        self._lock_depth = 0
+        # Guards the file handle and offset between threads; flock guards between processes
+        self._thread_lock = threading.RLock()
+
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def load(self, apply: Callable[[Dict[str, Any], Dict[str, Any]], None],
+             default: Callable[[], Dict[str, Any]],
+             upgrade: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Snapshot plus replayed journal records; `apply(state, record)` replays one record
+
+        `upgrade(state)` converts a snapshot in an older format before replay;
+        it must depend only on the document so all processes agree.
+        """
+        self._apply = apply
+        self._default = default
+        self._upgrade = upgrade
+        with self._thread_lock:
+            if self._file is None:
+                self._file = open(self.journal_path, 'ab')
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_SH)
+            try:
+                state = self._reload()
+            finally:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        if self._since_snapshot:
+            logger.info(f"Replayed {self._since_snapshot} staking journal records (seq {self.seq})")
+        return state
+
+    def _reload(self) -> Dict[str, Any]:
+        state, self.seq, self._snapshot_id = self._read_snapshot()
+        if state is None:
+            state = self._default()
+        elif self._upgrade is not None:
+            state = self._upgrade(state)
+        self._offset = 0
+        self._since_snapshot = self._replay(state)
+        return state
+
+    def _read_snapshot(self):
+        try:
+            snapshot_id = self._stat_id(os.stat(self.snapshot_path))
+            with open(self.snapshot_path, 'r') as f:
+                snapshot = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None, 0, None
+        if not isinstance(snapshot, dict):
+            return None, 0, snapshot_id
+        if "seq" in snapshot and "state" in snapshot:
+            return snapshot["state"], snapshot["seq"], snapshot_id
+        # Legacy staking.json holding the bare state document
+        return snapshot, 0, snapshot_id
+
+    @staticmethod
+    def _stat_id(stat: os.stat_result) -> tuple:
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _replay(self, state: Dict[str, Any]) -> int:
+        """Apply complete records after our offset; returns how many were applied"""
+        replayed = 0
+        with open(self.journal_path, 'rb') as f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Torn final line from a crash mid-write; overwritten by the next append
+                    logger.warning("Ignoring truncated staking journal record")
+                    break
+                self._offset += len(line)
+                record = json.loads(line)
+                if record["seq"] <= self.seq:
+                    # Already contained in the snapshot (crash before journal reset)
+                    continue
+                self._apply(state, record)
+                self.seq = record["seq"]
+                replayed += 1
+        return replayed
+
+    def catch_up(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Bring state up to date with other processes; call with the lock held
+
+        Returns the state to use from now on, which is a freshly loaded
+        document if another process compacted the journal meanwhile.
+        """
+        try:
+            snapshot_id = self._stat_id(os.stat(self.snapshot_path))
+        except FileNotFoundError:
+            snapshot_id = None
+        size = os.fstat(self._file.fileno()).st_size
+        if snapshot_id != self._snapshot_id or size < self._offset:
+            return self._reload()
+        if size > self._offset:
+            self._since_snapshot += self._replay(state)
+        return state
+
+    @contextmanager
+    def locked(self, exclusive: bool = True):
+        """Hold the journal lock across threads and processes (re-entrant)"""
+        with self._thread_lock:
+            if self._lock_depth:
+                # Nested use keeps the outer lock; re-flocking would downgrade it
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            self._lock_depth = 1
+            try:
+                yield
+            finally:
+                self._lock_depth = 0
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+    def append(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Log one operation (call inside locked() after catch_up); returns it with its seq"""
+        record = dict(record, seq=self.seq + 1)
+        line = json.dumps(record, separators=(',', ':')).encode() + b"\n"
+        # Drop a torn tail left by a crashed writer so it can't merge with our record
+        size = os.fstat(self._file.fileno()).st_size
+        if size > self._offset:
+            os.ftruncate(self._file.fileno(), self._offset)
+        self._file.write(line)
+        self._file.flush()
+        self.seq += 1
+        self._offset += len(line)
+        self._dirty = True
+        self._since_snapshot += 1
+
+        if time.monotonic() - self._last_fsync >= self.fsync_interval:
+            self._fsync()
+        return record
+
+    def _fsync(self):
+        os.fsync(self._file.fileno())
+        self._dirty = False
+        self._last_fsync = time.monotonic()
+
+    def sync(self):
+        with self._thread_lock:
+            if self._file is not None and self._dirty:
+                self._fsync()
+
+    def needs_snapshot(self) -> bool:
+        return self._since_snapshot >= self.snapshot_every
+
+    def snapshot(self, state: Dict[str, Any]):
+        """Write the full state atomically, then reset the journal (call inside locked())"""
+        tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"seq": self.seq, "state": state}, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self._fsync_directory()
+        self._snapshot_id = self._stat_id(os.stat(self.snapshot_path))
+
+        # Records up to self.seq are now in the snapshot; replay skips them even
+        # if we crash before the journal is reset
+        os.ftruncate(self._file.fileno(), 0)
+        os.fsync(self._file.fileno())
+        self._offset = 0
+        self._since_snapshot = 0
+        self._dirty = False
+
+    def _fsync_directory(self):
+        directory = os.path.dirname(os.path.abspath(self.snapshot_path))
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def close(self):
+        with self._thread_lock:
+            if self._file is not None:
+                if self._dirty:
+                    self._fsync()
+                self._file.close()
+                self._file = None
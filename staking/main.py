@@ -1,147 +1,348 @@
 import os
-import json
+import asyncio
 import logging
-from typing import Dict, Any, List
+import functools
+from typing import Dict, Any, List, Optional
 from fastapi import FastAPI, HTTPException
 from web3 import Web3
 import time
 
+from journal import StakingJournal
+from stake_table import StakeTable
+import pools
+from rewards_store import RewardsHistory
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+STAKING_FILE = os.getenv("STAKING_FILE", "data/staking.json")
+STAKING_SNAPSHOT_EVERY = int(os.getenv("STAKING_SNAPSHOT_EVERY", "1000"))
+STAKING_FSYNC_INTERVAL = float(os.getenv("STAKING_FSYNC_INTERVAL", "0.05"))
+STAKING_REWARDS_DB = os.getenv("STAKING_REWARDS_DB", "data/staking_rewards.db")
+MAX_LEADERBOARD_SIZE = 1000
+MAX_REWARDS_PAGE_SIZE = 500
+
+def ledger_operation(exclusive: bool):
+    """Run a StakingSystem method under the journal lock, on state caught up
+    with writes from other threads and processes
+
+    Writes take the lock exclusively, so read-modify-write sequences such as
+    computing and claiming rewards or updating total_staked can't interleave.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.journal.locked(exclusive):
+                self.data = self.journal.catch_up(self.data)
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
 class StakingSystem:
     def __init__(self, web3: Web3, token_contract):
         self.w3 = web3
         self.token_contract = token_contract
-        self.staking_file = "data/staking.json"
+        self.staking_file = STAKING_FILE
+        self.journal = StakingJournal(
+            self.staking_file,
+            snapshot_every=STAKING_SNAPSHOT_EVERY,
+            fsync_interval=STAKING_FSYNC_INTERVAL
+        )
+        self._stakes: Dict[str, StakeTable] = {}
+        self.rewards_history = RewardsHistory(STAKING_REWARDS_DB)
         self.load_data()
     
+    @staticmethod
+    def default_data() -> Dict[str, Any]:
+        return {
+            "version": pools.STATE_VERSION,
+            "pools": {
+                pools.DEFAULT_POOL: pools.new_pool(pools.DEFAULT_APY, int(time.time()))
+            },
+            "users": {}
+        }
+    
     def load_data(self):
-        try:
-            with open(self.staking_file, 'r') as f:
-                self.data = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.data = {
-                "pools": {
-                    "sela_pool": {
-                        "total_staked": 0,
-                        "apy": 15.0,
-                        "created_at": int(time.time())
-                    }
-                },
-                "users": {},
-                "rewards": {}
-            }
-            self.save_data()
+        self.data = self.journal.load(self.replay_record, self.default_data, upgrade=pools.upgrade_state)
+        if self.data.get("rewards") is not None or self.data.get("epochs") is not None:
+            self.move_rewards_history()
     
+    @ledger_operation(exclusive=True)
+    def move_rewards_history(self):
+        """Move claim and settlement history kept in older documents into the rewards store"""
+        legacy = self.data.pop("rewards", None)
+        legacy_epochs = self.data.pop("epochs", None)
+        if legacy is None and legacy_epochs is None:
+            # Another process moved it while we waited for the lock
+            return
+        self.rewards_history.add(
+            [
+                (f"legacy:{user_id}:{index}", user_id, entry.get("pool_id", pools.DEFAULT_POOL),
+                 entry["amount"], entry["claimed_at"])
+                for user_id, entries in (legacy or {}).items()
+                for index, entry in enumerate(entries)
+            ],
+            [
+                (f"legacy:{index}", epoch["pool_id"], epoch["settled_at"], epoch["total_rewards"], epoch["stakers"])
+                for index, epoch in enumerate(legacy_epochs or [])
+            ]
+        )
+        self.save_data()
+        logger.info("Moved rewards and epoch history out of the staking document")
+    
+    @ledger_operation(exclusive=True)
     def save_data(self):
+        """Compact the journal into a fresh snapshot"""
         try:
-            with open(self.staking_file, 'w') as f:
-                json.dump(self.data, f, indent=2)
+            self.journal.snapshot(self.data)
             return True
         except Exception as e:
             logger.error(f"Error saving staking data: {e}")
             return False
     
-    def stake_tokens(self, user_id: str, amount: float) -> Dict[str, Any]:
-        if user_id not in self.data["users"]:
-            self.data["users"][user_id] = {}
-        
-        user_stake = self.data["users"][user_id]
-        current_stake = user_stake.get("staked_amount", 0)
+    @staticmethod
+    def apply_record(data: Dict[str, Any], record: Dict[str, Any]):
+        """Apply one journaled operation to the state (used live and on replay)"""
+        op = record["op"]
+        ts = record["ts"]
+        # Records written before multi-pool support have no pool_id
+        pool_id = record.get("pool_id") or pools.DEFAULT_POOL
         
-        user_stake["staked_amount"] = current_stake + amount
-        user_stake["staked_since"] = int(time.time())
-        user_stake["last_claim"] = int(time.time())
+        if op == "create_pool":
+            data["pools"][pool_id] = pools.new_pool(record["apy"], ts)
+            return
         
-        # Update pool total
-        self.data["pools"]["sela_pool"]["total_staked"] += amount
+        pool = data["pools"][pool_id]
+        pools.update_pool(pool, ts)
         
-        self.save_data()
+        if op == "set_apy":
+            pool["apy"] = record["apy"]
+        elif op == "stake":
+            user_id = record["user_id"]
+            position = data["users"].setdefault(user_id, {}).get(pool_id)
+            if position is None:
+                position = data["users"][user_id][pool_id] = pools.new_position()
+                position["epoch"] = pool["epoch"]
+                position["last_claim"] = ts
+            pools.settle_position(pool, position)
+            position["staked_amount"] += record["amount"]
+            position["reward_debt"] = position["staked_amount"] * pool["acc_reward_per_share"]
+            position["staked_since"] = ts
+            
+            # Update pool total
+            pool["total_staked"] += record["amount"]
+        elif op == "claim":
+            user_id = record["user_id"]
+            position = data["users"][user_id][pool_id]
+            pools.settle_position(pool, position)
+            position["pending"] = 0.0
+            position["last_claim"] = ts
+        elif op == "settle":
+            # Pays out everything accrued so far; positions restart from settled_acc.
+            # The payouts themselves go to the rewards store (see replay_record)
+            pool["epoch"] += 1
+            pool["settled_acc"] = pool["acc_reward_per_share"]
+            pool["settled_at"] = ts
+        else:
+            raise ValueError(f"Unknown staking journal op: {op}")
+    
+    def settle_payouts(self, data: Dict[str, Any], pool_id: str, ts: int) -> Dict[str, float]:
+        """user_id -> rewards a settlement at ts pays, from the state before it is applied"""
+        pool = data["pools"][pool_id]
+        acc = pools.acc_at(pool, ts)
+        table = self._stakes.get(pool_id)
+        if table is not None and table.source is data:
+            return table.payouts(table.accrued(acc, pool["epoch"], pool["settled_acc"]))
+        payouts = {}
+        for user_id, positions in data["users"].items():
+            position = positions.get(pool_id)
+            if position is not None:
+                rewards = pools.pending_rewards(pool, position, acc)
+                if rewards > 0:
+                    payouts[user_id] = rewards
+        return payouts
+    
+    def replay_record(self, data: Dict[str, Any], record: Dict[str, Any]):
+        """apply_record, keeping the columnar stake tables and rewards store in step with the document"""
+        pool_id = record.get("pool_id") or pools.DEFAULT_POOL
+        # Rows are idempotent by journal seq, so replays and other processes don't duplicate them
+        if record["op"] == "settle":
+            # Replay reaches the same pre-settlement state, so the payouts come out identical
+            payouts = self.settle_payouts(data, pool_id, record["ts"])
+            self.rewards_history.add(
+                [(f"seq:{record['seq']}:{user_id}", user_id, pool_id, amount, record["ts"])
+                 for user_id, amount in payouts.items()],
+                [(f"seq:{record['seq']}", pool_id, record["ts"], record["amount"], record["stakers"])]
+            )
+        self.apply_record(data, record)
+        if record["op"] == "claim":
+            self.rewards_history.add([
+                (f"seq:{record['seq']}", record["user_id"], pool_id, record["amount"], record["ts"])
+            ])
+        table = self._stakes.get(pool_id)
+        user_id = record.get("user_id")
+        if table is not None and table.source is data and user_id in data["users"]:
+            table.upsert(user_id, data["users"][user_id][pool_id])
+    
+    def stake_table(self, pool_id: str) -> StakeTable:
+        """Columnar view of a pool's positions, rebuilt only when the document was reloaded"""
+        table = self._stakes.get(pool_id)
+        if table is None or table.source is not self.data:
+            table = self._stakes[pool_id] = StakeTable.from_users(self.data, pool_id)
+        return table
+    
+    def commit(self, record: Dict[str, Any]):
+        """Journal an operation, apply it, and compact when the journal is long"""
+        record = self.journal.append(record)
+        self.replay_record(self.data, record)
+        if self.journal.needs_snapshot():
+            self.save_data()
+    
+    def get_pool(self, pool_id: str) -> Dict[str, Any]:
+        pool = self.data["pools"].get(pool_id)
+        if pool is None:
+            raise KeyError(f"Unknown pool: {pool_id}")
+        return pool
+    
+    @ledger_operation(exclusive=True)
+    def set_pool(self, pool_id: str, apy: float) -> Dict[str, Any]:
+        """Create a pool, or change its APY from now on"""
+        op = "set_apy" if pool_id in self.data["pools"] else "create_pool"
+        self.commit({"op": op, "pool_id": pool_id, "apy": apy, "ts": int(time.time())})
+        return self.get_pool_info(pool_id)
+    
+    @ledger_operation(exclusive=True)
+    def stake_tokens(self, user_id: str, amount: float, pool_id: str = pools.DEFAULT_POOL) -> Dict[str, Any]:
+        pool = self.get_pool(pool_id)
+        self.commit({"op": "stake", "user_id": user_id, "pool_id": pool_id, "amount": amount, "ts": int(time.time())})
+        position = self.data["users"][user_id][pool_id]
         
         return {
             "user_id": user_id,
-            "staked_amount": user_stake["staked_amount"],
-            "total_staked": self.data["pools"]["sela_pool"]["total_staked"],
-            "apy": self.data["pools"]["sela_pool"]["apy"]
+            "pool_id": pool_id,
+            "staked_amount": position["staked_amount"],
+            "total_staked": pool["total_staked"],
+            "apy": pool["apy"]
         }
     
-    def calculate_rewards(self, user_id: str) -> float:
-        if user_id not in self.data["users"]:
+    def calculate_rewards(self, user_id: str, pool_id: str = pools.DEFAULT_POOL) -> float:
+        position = self.data["users"].get(user_id, {}).get(pool_id)
+        if position is None:
             return 0.0
         
-        user_stake = self.data["users"][user_id]
-        staked_amount = user_stake.get("staked_amount", 0)
-        staked_since = user_stake.get("staked_since", time.time())
-        last_claim = user_stake.get("last_claim", staked_since)
-        
-        if staked_amount == 0:
-            return 0.0
-        
-        # Calculate time elapsed in years
-        time_elapsed = time.time() - last_claim
-        years_elapsed = time_elapsed / 31536000  # seconds in year
-        
-        # Calculate rewards
-        apy = self.data["pools"]["sela_pool"]["apy"]
-        rewards = staked_amount * (apy / 100) * years_elapsed
-        
-        return rewards
+        pool = self.get_pool(pool_id)
+        return pools.pending_rewards(pool, position, pools.acc_at(pool, time.time()))
     
-    def claim_rewards(self, user_id: str) -> Dict[str, Any]:
-        rewards = self.calculate_rewards(user_id)
+    @ledger_operation(exclusive=True)
+    def claim_rewards(self, user_id: str, pool_id: str = pools.DEFAULT_POOL) -> Dict[str, Any]:
+        pool = self.get_pool(pool_id)
+        now = int(time.time())
+        position = self.data["users"].get(user_id, {}).get(pool_id)
+        rewards = pools.pending_rewards(pool, position, pools.acc_at(pool, now)) if position else 0.0
         
         if rewards <= 0:
             return {"rewards": 0, "message": "No rewards to claim"}
         
-        # Update user's last claim time
-        self.data["users"][user_id]["last_claim"] = int(time.time())
-        
-        # Add to rewards history
-        if user_id not in self.data["rewards"]:
-            self.data["rewards"][user_id] = []
-        
-        self.data["rewards"][user_id].append({
-            "amount": rewards,
-            "claimed_at": int(time.time())
-        })
-        
-        self.save_data()
+        # Update user's last claim time and rewards history
+        self.commit({"op": "claim", "user_id": user_id, "pool_id": pool_id, "amount": rewards, "ts": now})
         
         return {
             "user_id": user_id,
+            "pool_id": pool_id,
             "rewards_claimed": rewards,
-            "total_staked": self.data["users"][user_id]["staked_amount"],
-            "apy": self.data["pools"]["sela_pool"]["apy"]
+            "total_staked": position["staked_amount"],
+            "apy": pool["apy"]
         }
     
-    def get_user_staking_info(self, user_id: str) -> Dict[str, Any]:
-        if user_id not in self.data["users"]:
+    @ledger_operation(exclusive=False)
+    def get_user_staking_info(self, user_id: str, pool_id: str = pools.DEFAULT_POOL) -> Dict[str, Any]:
+        pool = self.get_pool(pool_id)
+        position = self.data["users"].get(user_id, {}).get(pool_id)
+        if position is None:
             return {
+                "pool_id": pool_id,
                 "staked_amount": 0,
                 "rewards": 0,
-                "apy": self.data["pools"]["sela_pool"]["apy"]
+                "apy": pool["apy"]
             }
         
-        user_stake = self.data["users"][user_id]
-        rewards = self.calculate_rewards(user_id)
-        
         return {
-            "staked_amount": user_stake.get("staked_amount", 0),
-            "rewards": rewards,
-            "apy": self.data["pools"]["sela_pool"]["apy"],
-            "staked_since": user_stake.get("staked_since"),
-            "last_claim": user_stake.get("last_claim")
+            "pool_id": pool_id,
+            "staked_amount": position["staked_amount"],
+            "rewards": self.calculate_rewards(user_id, pool_id),
+            "apy": pool["apy"],
+            "staked_since": position["staked_since"],
+            "last_claim": position["last_claim"]
         }
     
-    def get_pool_info(self) -> Dict[str, Any]:
-        pool = self.data["pools"]["sela_pool"]
+    def get_rewards_history(self, user_id: str, cursor: Optional[int] = None, limit: int = 50,
+                            pool_id: Optional[str] = None) -> Dict[str, Any]:
+        return self.rewards_history.page(user_id, cursor, limit, pool_id)
+    
+    @ledger_operation(exclusive=False)
+    def get_pool_info(self, pool_id: str = pools.DEFAULT_POOL) -> Dict[str, Any]:
+        pool = self.get_pool(pool_id)
         return {
+            "pool_id": pool_id,
             "total_staked": pool["total_staked"],
             "apy": pool["apy"],
-            "active_stakers": len(self.data["users"]),
-            "created_at": pool["created_at"]
+            "active_stakers": len(self.stake_table(pool_id)),
+            "created_at": pool["created_at"],
+            "acc_reward_per_share": pools.acc_at(pool, time.time())
+        }
+    
+    @ledger_operation(exclusive=False)
+    def list_pools(self) -> List[Dict[str, Any]]:
+        return [self.get_pool_info(pool_id) for pool_id in self.data["pools"]]
+    
+    @ledger_operation(exclusive=False)
+    def get_pool_rewards(self, pool_id: str = pools.DEFAULT_POOL) -> Dict[str, Any]:
+        """Pool-wide staked and unclaimed reward totals, computed over all stakers at once"""
+        pool = self.get_pool(pool_id)
+        now = time.time()
+        acc = pools.acc_at(pool, now)
+        totals = self.stake_table(pool_id).totals(acc, pool["epoch"], pool["settled_acc"])
+        totals.update({"pool_id": pool_id, "apy": pool["apy"], "settled_at": pool["settled_at"], "as_of": now})
+        return totals
+    
+    @ledger_operation(exclusive=False)
+    def get_leaderboard(self, limit: int = 100, pool_id: str = pools.DEFAULT_POOL) -> List[Dict[str, Any]]:
+        pool = self.get_pool(pool_id)
+        acc = pools.acc_at(pool, time.time())
+        top = self.stake_table(pool_id).top(limit, acc, pool["epoch"], pool["settled_acc"])
+        return [
+            {"rank": rank, "user_id": user_id, "staked_amount": staked, "rewards": rewards}
+            for rank, (user_id, staked, rewards) in enumerate(top, start=1)
+        ]
+    
+    @ledger_operation(exclusive=True)
+    def settle_epoch(self, include_payouts: bool = False, pool_id: str = pools.DEFAULT_POOL) -> Dict[str, Any]:
+        """Pay out rewards accrued by every staker in a pool up to now in one vectorized pass
+
+        Each staker's payout is written to the rewards history with the journal record.
+        """
+        pool = self.get_pool(pool_id)
+        now = int(time.time())
+        table = self.stake_table(pool_id)
+        accrued = table.accrued(pools.acc_at(pool, now), pool["epoch"], pool["settled_acc"])
+        total_rewards = float(accrued.sum())
+        stakers = int((accrued > 0).sum())
+        
+        self.commit({
+            "op": "settle", "user_id": None, "pool_id": pool_id,
+            "amount": total_rewards, "stakers": stakers, "ts": now
+        })
+        
+        result = {
+            "pool_id": pool_id,
+            "settled_at": now,
+            "total_rewards": total_rewards,
+            "stakers": stakers,
+            "apy": pool["apy"]
         }
+        if include_payouts:
+            result["payouts"] = table.payouts(accrued)
+        return result
 
 # Staking API
 staking_app = FastAPI(title="SELA Staking API")
@@ -153,26 +354,108 @@ staking_system = StakingSystem(None, None)
 async def staking_root():
     return {"message": "SELA Staking System", "status": "active"}
 
+async def sync_journal():
+    # Flush batched fsyncs even when no further writes arrive. sync() waits for
+    # the journal lock, which ledger threads hold across flock waits and
+    # snapshots, so it runs in a worker thread instead of on the event loop
+    while True:
+        await asyncio.sleep(STAKING_FSYNC_INTERVAL)
+        await asyncio.to_thread(staking_system.journal.sync)
+
+@staking_app.on_event("startup")
+async def start_journal_sync():
+    staking_app.state.journal_sync = asyncio.create_task(sync_journal())
+
+@staking_app.on_event("shutdown")
+async def close_journal():
+    staking_app.state.journal_sync.cancel()
+    staking_system.save_data()
+    staking_system.journal.close()
+    staking_system.rewards_history.close()
+
+def unknown_pool(e: KeyError) -> HTTPException:
+    return HTTPException(status_code=404, detail=e.args[0])
+
+# Ledger calls may wait on the journal lock, so endpoints run in FastAPI's threadpool
 @staking_app.get("/pool")
-async def get_pool_info():
-    return staking_system.get_pool_info()
+def get_pool_info(pool_id: str = pools.DEFAULT_POOL):
+    try:
+        return staking_system.get_pool_info(pool_id)
+    except KeyError as e:
+        raise unknown_pool(e)
+
+@staking_app.get("/pools")
+def list_pools():
+    return {"pools": staking_system.list_pools()}
+
+@staking_app.post("/pool/{pool_id}")
+def set_pool(pool_id: str, pool_data: dict):
+    apy = pool_data.get("apy")
+    if not isinstance(apy, (int, float)) or apy < 0:
+        raise HTTPException(status_code=400, detail="Invalid apy")
+    return staking_system.set_pool(pool_id, float(apy))
+
+@staking_app.get("/pool/rewards")
+def get_pool_rewards(pool_id: str = pools.DEFAULT_POOL):
+    try:
+        return staking_system.get_pool_rewards(pool_id)
+    except KeyError as e:
+        raise unknown_pool(e)
+
+@staking_app.get("/leaderboard")
+def get_leaderboard(limit: int = 100, pool_id: str = pools.DEFAULT_POOL):
+    if limit <= 0 or limit > MAX_LEADERBOARD_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_LEADERBOARD_SIZE}")
+    try:
+        return {"pool_id": pool_id, "leaderboard": staking_system.get_leaderboard(limit, pool_id)}
+    except KeyError as e:
+        raise unknown_pool(e)
+
+@staking_app.post("/epoch/settle")
+def settle_epoch(include_payouts: bool = False, pool_id: str = pools.DEFAULT_POOL):
+    try:
+        return staking_system.settle_epoch(include_payouts, pool_id)
+    except KeyError as e:
+        raise unknown_pool(e)
+
+@staking_app.get("/epochs")
+def get_epochs(limit: int = 50, pool_id: str = pools.DEFAULT_POOL):
+    if limit <= 0 or limit > MAX_REWARDS_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_REWARDS_PAGE_SIZE}")
+    return {"pool_id": pool_id, "epochs": staking_system.rewards_history.epochs(pool_id, limit)}
 
 @staking_app.get("/user/{user_id}")
-async def get_user_staking(user_id: str):
-    return staking_system.get_user_staking_info(user_id)
+def get_user_staking(user_id: str, pool_id: str = pools.DEFAULT_POOL):
+    try:
+        return staking_system.get_user_staking_info(user_id, pool_id)
+    except KeyError as e:
+        raise unknown_pool(e)
+
+@staking_app.get("/rewards/{user_id}")
+def get_rewards_history(user_id: str, cursor: Optional[int] = None, limit: int = 50,
+                        pool_id: Optional[str] = None):
+    if limit <= 0 or limit > MAX_REWARDS_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_REWARDS_PAGE_SIZE}")
+    return staking_system.get_rewards_history(user_id, cursor, limit, pool_id)
 
 @staking_app.post("/stake/{user_id}")
-async def stake_tokens(user_id: str, stake_data: dict):
+def stake_tokens(user_id: str, stake_data: dict):
     amount = stake_data.get("amount", 0)
     if amount <= 0:
         raise HTTPException(status_code=400, detail="Invalid amount")
     
-    result = staking_system.stake_tokens(user_id, amount)
+    try:
+        result = staking_system.stake_tokens(user_id, amount, stake_data.get("pool_id", pools.DEFAULT_POOL))
+    except KeyError as e:
+        raise unknown_pool(e)
     return result
 
 @staking_app.post("/claim/{user_id}")
-async def claim_rewards(user_id: str):
-    result = staking_system.claim_rewards(user_id)
+def claim_rewards(user_id: str, pool_id: str = pools.DEFAULT_POOL):
+    try:
+        result = staking_system.claim_rewards(user_id, pool_id)
+    except KeyError as e:
+        raise unknown_pool(e)
     return result
 
 if __name__ == "__main__":
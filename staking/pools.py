@@ -0,0 +1,124 @@
+"""Reward-per-share accounting for staking pools
+
+Each pool keeps a global accumulator `acc_reward_per_share`: the reward one
+staked token has earned since the pool's accounting started. It only moves
+forward when the pool is touched, by `rate * elapsed` where rate is the APY
+per second in force at the time, so APY changes just advance the
+accumulator before switching rate. A position stores `reward_debt` (the
+accumulator value already accounted for, times its amount) plus `pending`
+rewards carried over from before its last change, so reading or claiming a
+user's rewards is O(1) regardless of APY history.
+
+Epoch settlement pays out everything accrued in a pool at once: it records
+the accumulator value (`settled_acc`) and bumps the pool's `epoch`. A position
+from an older epoch has been paid up to `settled_acc` and only earns from there.
+"""
+from typing import Any, Dict
+
+SECONDS_PER_YEAR = 31536000
+
+DEFAULT_POOL = "sela_pool"
+DEFAULT_APY = 15.0
+STATE_VERSION = 2
+
+
+def rate_per_second(apy: float) -> float:
+    return apy / 100 / SECONDS_PER_YEAR
+
+
+def new_pool(apy: float, ts: int) -> Dict[str, Any]:
+    return {
+        "total_staked": 0,
+        "apy": apy,
+        "created_at": ts,
+        "acc_reward_per_share": 0.0,
+        "last_update": ts,
+        "epoch": 0,
+        "settled_acc": 0.0,
+        "settled_at": None
+    }
+
+
+def new_position() -> Dict[str, Any]:
+    return {
+        "staked_amount": 0,
+        "reward_debt": 0.0,
+        "pending": 0.0,
+        "epoch": 0,
+        "staked_since": None,
+        "last_claim": None
+    }
+
+
+def acc_at(pool: Dict[str, Any], ts: float) -> float:
+    """Accumulator value at ts without modifying the pool"""
+    elapsed = max(ts - pool["last_update"], 0)
+    return pool["acc_reward_per_share"] + rate_per_second(pool["apy"]) * elapsed
+
+
+def update_pool(pool: Dict[str, Any], ts: float):
+    pool["acc_reward_per_share"] = acc_at(pool, ts)
+    pool["last_update"] = max(ts, pool["last_update"])
+
+
+def pending_rewards(pool: Dict[str, Any], position: Dict[str, Any], acc: float) -> float:
+    """Unclaimed rewards of a position given the pool accumulator value `acc`"""
+    if position["epoch"] != pool["epoch"]:
+        return position["staked_amount"] * (acc - pool["settled_acc"])
+    return position["pending"] + position["staked_amount"] * acc - position["reward_debt"]
+
+
+def settle_position(pool: Dict[str, Any], position: Dict[str, Any]):
+    """Fold accrued rewards into `pending` at the pool's current accumulator"""
+    acc = pool["acc_reward_per_share"]
+    position["pending"] = pending_rewards(pool, position, acc)
+    position["reward_debt"] = position["staked_amount"] * acc
+    position["epoch"] = pool["epoch"]
+
+
+def upgrade_state(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert the single-pool document (users -> flat stake) to per-pool positions
+
+    The old linear reward since `last_claim` is reproduced exactly by starting
+    the accumulator at rate * t, i.e. as if it had run since t = 0, and
+    setting each position's debt to amount * rate * last_claim. The result
+    depends only on the document, so every process upgrades identically.
+    """
+    if data.get("version", 1) >= STATE_VERSION:
+        return data
+
+    old_pool = data.get("pools", {}).get(DEFAULT_POOL, {})
+    apy = old_pool.get("apy", DEFAULT_APY)
+    rate = rate_per_second(apy)
+    settled_at = old_pool.get("settled_at") or 0
+    created_at = old_pool.get("created_at", 0)
+
+    positions = {}
+    last_update = max(created_at, settled_at)
+    for user_id, stake in data.get("users", {}).items():
+        amount = stake.get("staked_amount", 0)
+        last_claim = stake.get("last_claim", stake.get("staked_since", created_at))
+        since = max(last_claim, settled_at)
+        last_update = max(last_update, since)
+        position = new_position()
+        position.update({
+            "staked_amount": amount,
+            "reward_debt": amount * rate * since,
+            "staked_since": stake.get("staked_since"),
+            "last_claim": last_claim
+        })
+        positions[user_id] = {DEFAULT_POOL: position}
+
+    pool = new_pool(apy, created_at)
+    pool.update({
+        "total_staked": old_pool.get("total_staked", 0),
+        "acc_reward_per_share": rate * last_update,
+        "last_update": last_update,
+        "settled_acc": rate * settled_at,
+        "settled_at": old_pool.get("settled_at")
+    })
+
+    data["pools"] = {DEFAULT_POOL: pool}
+    data["users"] = positions
+    data["version"] = STATE_VERSION
+    return data
@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RewardsHistory:
+    """Paid-rewards history in SQLite, kept out of the hot staking document
+
+    Holds one row per claim and per staker paid by an epoch settlement, plus
+    one summary row per settlement. Rows are keyed by their journal record
+    (`record_key`), so re-applying the same record - on journal replay or in
+    another process - is a no-op. History is read newest first with keyset
+    pagination on the row id.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS rewards (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                record_key TEXT NOT NULL UNIQUE,
+                user_id TEXT NOT NULL,
+                pool_id TEXT NOT NULL,
+                amount REAL NOT NULL,
+                claimed_at INTEGER NOT NULL
+            )
+        ''')
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_rewards_user_id ON rewards(user_id, id)"
+        )
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS epochs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                record_key TEXT NOT NULL UNIQUE,
+                pool_id TEXT NOT NULL,
+                settled_at INTEGER NOT NULL,
+                total_rewards REAL NOT NULL,
+                stakers INTEGER NOT NULL
+            )
+        ''')
+
+    def add(self, rows: Iterable[Tuple[str, str, str, float, int]],
+            epochs: Iterable[Tuple[str, str, int, float, int]] = ()):
+        """Insert (record_key, user_id, pool_id, amount, claimed_at) reward rows and
+        (record_key, pool_id, settled_at, total_rewards, stakers) epoch rows in one
+        transaction, skipping known keys"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO rewards (record_key, user_id, pool_id, amount, claimed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO epochs (record_key, pool_id, settled_at, total_rewards, stakers) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    epochs
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def page(self, user_id: str, cursor: Optional[int] = None, limit: int = 50,
+             pool_id: Optional[str] = None) -> Dict[str, Any]:
+        """One page of a user's claims, newest first; pass next_cursor to continue"""
+        sql = "SELECT id, pool_id, amount, claimed_at FROM rewards WHERE user_id = ?"
+        params: List[Any] = [user_id]
+        if pool_id is not None:
+            sql += " AND pool_id = ?"
+            params.append(pool_id)
+        if cursor is not None:
+            sql += " AND id < ?"
+            params.append(cursor)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            "user_id": user_id,
+            "rewards": [
+                {"id": row[0], "pool_id": row[1], "amount": row[2], "claimed_at": row[3]}
+                for row in rows
+            ],
+            "next_cursor": rows[-1][0] if has_more else None
+        }
+
+    def epochs(self, pool_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """A pool's most recent settlements, newest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT settled_at, total_rewards, stakers FROM epochs WHERE pool_id = ? ORDER BY id DESC LIMIT ?",
+                (pool_id, limit)
+            ).fetchall()
+        return [{"settled_at": row[0], "total_rewards": row[1], "stakers": row[2]} for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
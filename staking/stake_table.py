@@ -0,0 +1,93 @@
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+COLUMNS = ("amount", "reward_debt", "pending", "epoch")
+
+
+class StakeTable:
+    """Column-oriented copy of one pool's positions for pool-wide math
+
+    One row per user with `amount`, `reward_debt`, `pending` and `epoch`
+    held in NumPy arrays, so accrual, totals, rankings and epoch payouts for
+    every staker are single vectorized expressions instead of a Python loop.
+    The table mirrors a pool in a state document (`source`) and is updated
+    row by row as journal records are applied.
+    """
+
+    def __init__(self, source: Dict[str, Any], pool_id: str, capacity: int = 1024):
+        self.source = source
+        self.pool_id = pool_id
+        self.user_ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        capacity = max(capacity, 1)
+        self.amount = np.zeros(capacity, dtype=np.float64)
+        self.reward_debt = np.zeros(capacity, dtype=np.float64)
+        self.pending = np.zeros(capacity, dtype=np.float64)
+        self.epoch = np.zeros(capacity, dtype=np.int64)
+
+    @classmethod
+    def from_users(cls, source: Dict[str, Any], pool_id: str) -> "StakeTable":
+        users = source["users"]
+        table = cls(source, pool_id, capacity=len(users) * 2)
+        for user_id, positions in users.items():
+            position = positions.get(pool_id)
+            if position is not None:
+                table.upsert(user_id, position)
+        return table
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def _grow(self):
+        capacity = len(self.amount) * 2
+        for name in COLUMNS:
+            old = getattr(self, name)
+            column = np.zeros(capacity, dtype=old.dtype)
+            column[:len(self.user_ids)] = old[:len(self.user_ids)]
+            setattr(self, name, column)
+
+    def upsert(self, user_id: str, position: Dict[str, Any]):
+        row = self.index.get(user_id)
+        if row is None:
+            if len(self.user_ids) == len(self.amount):
+                self._grow()
+            row = len(self.user_ids)
+            self.index[user_id] = row
+            self.user_ids.append(user_id)
+        self.amount[row] = position["staked_amount"]
+        self.reward_debt[row] = position["reward_debt"]
+        self.pending[row] = position["pending"]
+        self.epoch[row] = position["epoch"]
+
+    def accrued(self, acc: float, pool_epoch: int, settled_acc: float) -> np.ndarray:
+        """Unclaimed rewards per row at accumulator value `acc` (see pools.pending_rewards)"""
+        n = len(self.user_ids)
+        amount = self.amount[:n]
+        current = self.pending[:n] + amount * acc - self.reward_debt[:n]
+        settled = amount * (acc - settled_acc)
+        return np.where(self.epoch[:n] == pool_epoch, current, settled)
+
+    def totals(self, acc: float, pool_epoch: int, settled_acc: float) -> Dict[str, Any]:
+        n = len(self.user_ids)
+        return {
+            "total_staked": float(self.amount[:n].sum()),
+            "total_accrued_rewards": float(self.accrued(acc, pool_epoch, settled_acc).sum()),
+            "active_stakers": int(np.count_nonzero(self.amount[:n]))
+        }
+
+    def top(self, limit: int, acc: float, pool_epoch: int, settled_acc: float) -> List[Tuple[str, float, float]]:
+        """(user_id, staked_amount, accrued) for the largest stakes, biggest first"""
+        n = len(self.user_ids)
+        limit = min(limit, n)
+        if limit <= 0:
+            return []
+        amounts = self.amount[:n]
+        rows = np.argpartition(-amounts, limit - 1)[:limit]
+        rows = rows[np.argsort(-amounts[rows], kind="stable")]
+        accrued = self.accrued(acc, pool_epoch, settled_acc)
+        return [(self.user_ids[row], float(amounts[row]), float(accrued[row])) for row in rows]
+
+    def payouts(self, accrued: np.ndarray) -> Dict[str, float]:
+        """user_id -> amount for the rows of an accrued() result that earned anything"""
+        return {self.user_ids[row]: float(accrued[row]) for row in np.flatnonzero(accrued > 0)}